@@ -0,0 +1,195 @@
+# bench_concurrency.py
+"""
+Benchmark de concurrence : API synchrone (threadpool) vs asynchrone.
+Deux serveurs uvicorn sont lancés sur le même ES / MongoDB :
+- async : main:app (handlers async def, clients asynchrones),
+- sync  : bench_concurrency:sync_app, les mêmes endpoints en def bloquants sur
+  les clients synchrones (comportement d'origine, limité par le threadpool),
+puis N clients concurrents bouclent sur les chemins demandés pendant
+--duration secondes. Affiche débit, latences p50 / p95 / p99 et erreurs.
+Le générateur de charge tourne dans un seul processus : à 1000 clients il
+peut devenir lui-même le goulot, le lancer depuis une autre machine si besoin.
+"""
+# python bench_concurrency.py
+# python bench_concurrency.py --clients 50 200 1000 --duration 20
+# python bench_concurrency.py --path "/api/search?q=theft" --path /api/mongo_summary --threadpool 100
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import anyio
+import httpx
+from fastapi import FastAPI, HTTPException, Query
+
+from es_client import get_es_client
+from mongo_client import get_mongo_client, MONGO_DB, MONGO_COLL
+from main import ES_INDEX, format_hit, SUMMARY_BODY, MONGO_SUMMARY_PIPELINE
+from query_builder import normalize_params, search_body
+
+DEFAULT_PATHS = ["/api/search?q=theft", "/api/aggregations/summary", "/api/count"]
+# taille du threadpool de la variante sync (40 par défaut dans Starlette / anyio)
+SYNC_THREADPOOL = int(os.getenv("SYNC_THREADPOOL", "40"))
+
+
+# -------------------------------------------------
+# Variante synchrone de référence
+# -------------------------------------------------
+@asynccontextmanager
+async def sync_lifespan(app):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = SYNC_THREADPOOL
+    app.state.es = get_es_client()
+    app.state.mongo = get_mongo_client()
+    yield
+    app.state.es.close()
+    app.state.mongo.close()
+
+
+sync_app = FastAPI(title="CitySafety API (sync)", lifespan=sync_lifespan)
+
+
+@sync_app.get("/")
+def sync_health():
+    return {"ok": True}
+
+
+@sync_app.get("/api/count")
+def sync_count(index: str = ES_INDEX):
+    es = sync_app.state.es
+    if not es.indices.exists(index=index):
+        raise HTTPException(status_code=404, detail="Index not found")
+    return {"count": es.count(index=index).get("count", 0)}
+
+
+@sync_app.get("/api/search")
+def sync_search(q: Optional[str] = Query(None), primary_type: Optional[str] = Query(None),
+                district: Optional[str] = Query(None), date_from: Optional[str] = Query(None),
+                date_to: Optional[str] = Query(None), size: int = 20, page: int = 0,
+                index: str = ES_INDEX):
+    es = sync_app.state.es
+    if not es.indices.exists(index=index):
+        raise HTTPException(status_code=404, detail="Index not found")
+    params = normalize_params(q, primary_type, district, date_from, date_to)
+    body = search_body(params, size, page * size)
+    res = es.search(index=index, body=body)
+    return {"total": res["hits"]["total"]["value"],
+            "hits": [format_hit(h) for h in res["hits"]["hits"]]}
+
+
+@sync_app.get("/api/aggregations/summary")
+def sync_summary(index: str = ES_INDEX):
+    es = sync_app.state.es
+    if not es.indices.exists(index=index):
+        raise HTTPException(status_code=404, detail="Index not found")
+    return es.search(index=index, body=SUMMARY_BODY)["aggregations"]
+
+
+@sync_app.get("/api/mongo_summary")
+def sync_mongo_summary():
+    coll = sync_app.state.mongo[MONGO_DB][MONGO_COLL]
+    result = list(coll.aggregate(MONGO_SUMMARY_PIPELINE))
+    return result[0] if result else {"totalTypes": 0, "totalDistricts": 0}
+
+
+# -------------------------------------------------
+# Serveurs et générateur de charge
+# -------------------------------------------------
+def start_server(app_path, port, threadpool):
+    env = dict(os.environ, SYNC_THREADPOOL=str(threadpool))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app_path, "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit(f"❌ {app_path} n'a pas démarré sur le port {port}")
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+async def run_load(base_url, paths, clients, duration):
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async def client_loop(i, http, end):
+        nonlocal errors
+        n = i
+        while time.perf_counter() < end:
+            path = paths[n % len(paths)]
+            n += 1
+            t0 = time.perf_counter()
+            try:
+                r = await http.get(path)
+                if r.status_code >= 400:
+                    errors += 1
+                    continue
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - t0)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as http:
+        # échauffement : ouvrir les connexions avant de mesurer
+        await asyncio.gather(*(http.get("/") for _ in range(min(clients, 50))))
+        start = time.perf_counter()
+        end = start + duration
+        await asyncio.gather(*(client_loop(i, http, end) for i in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50) * 1000,
+        "p95": percentile(latencies, 95) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "errors": errors,
+    }
+
+
+def bench(clients=(50, 200, 1000), duration=10.0, paths=DEFAULT_PATHS, port=8100,
+          threadpool=SYNC_THREADPOOL):
+    variants = [("sync", "bench_concurrency:sync_app", port),
+                ("async", "main:app", port + 1)]
+    print(f"Chemins : {', '.join(paths)} — {duration:.0f} s par mesure, "
+          f"threadpool sync : {threadpool}")
+    print(f"{'variante':<8} {'clients':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'erreurs':>8}")
+    for name, app_path, p in variants:
+        proc = start_server(app_path, p, threadpool)
+        try:
+            for n in clients:
+                r = asyncio.run(run_load(f"http://127.0.0.1:{p}", paths, n, duration))
+                print(f"{name:<8} {n:>7} {r['rps']:>9,.0f} {r['p50']:>8.1f} {r['p95']:>8.1f} "
+                      f"{r['p99']:>8.1f} {r['errors']:>8}")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Benchmark API sync vs async")
+    p.add_argument("--clients", type=int, nargs="+", default=[50, 200, 1000])
+    p.add_argument("--duration", type=float, default=10.0, help="secondes par mesure")
+    p.add_argument("--path", action="append", default=None,
+                   help="chemin à interroger (répétable)")
+    p.add_argument("--port", type=int, default=8100, help="port de la variante sync (+1 pour async)")
+    p.add_argument("--threadpool", type=int, default=SYNC_THREADPOOL,
+                   help="threads de la variante sync")
+    args = p.parse_args()
+    bench(args.clients, args.duration, args.path or DEFAULT_PATHS, args.port, args.threadpool)
@@ -0,0 +1,81 @@
+# bench_pagination.py
+"""
+Benchmark de pagination profonde sur /api/search (API lancée à part) :
+- page : from/size, une requête par profondeur mesurée (coût croissant,
+  refusé au-delà de ES_MAX_RESULT_WINDOW),
+- cursor : on parcourt les pages avec next_cursor et on relève la latence
+  de la page atteinte à chaque profondeur mesurée.
+Les mêmes filtres sont utilisés pour les deux modes.
+"""
+# python bench_pagination.py
+# python bench_pagination.py --api http://localhost:8000 --size 100 --depths 0 10 50 99 500 --district 11
+import time
+import argparse
+import statistics
+
+import httpx
+
+
+def timed_get(http, params, repeat=1):
+    latencies = []
+    res = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        res = http.get("/api/search", params=params)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return res, statistics.median(latencies)
+
+
+def bench(api="http://localhost:8000", size=100, depths=(0, 10, 50, 99, 200, 500),
+          filters=None, repeat=3):
+    filters = {k: v for k, v in (filters or {}).items() if v}
+    depths = sorted(depths)
+    results = {d: {"page": None, "cursor": None} for d in depths}
+
+    with httpx.Client(base_url=api, timeout=120) as http:
+        for d in depths:
+            res, ms = timed_get(http, dict(filters, size=size, page=d), repeat)
+            results[d]["page"] = ms if res.status_code == 200 else f"HTTP {res.status_code}"
+
+        # parcours complet au curseur jusqu'à la profondeur max
+        cursor = None
+        for page in range(depths[-1] + 1):
+            params = dict(filters, size=size)
+            params.update({"cursor": cursor} if cursor else {"paginate": "cursor"})
+            t0 = time.perf_counter()
+            res = http.get("/api/search", params=params)
+            ms = (time.perf_counter() - t0) * 1000
+            res.raise_for_status()
+            if page in results:
+                results[page]["cursor"] = ms
+            cursor = res.json()["next_cursor"]
+            if not cursor:
+                break
+
+    print(f"size={size}, filtres={filters or 'aucun'}")
+    print(f"{'page':>6} {'offset':>9} {'from/size ms':>14} {'cursor ms':>11}")
+    for d in depths:
+        page_ms = results[d]["page"]
+        cursor_ms = results[d]["cursor"]
+        page_txt = f"{page_ms:.1f}" if isinstance(page_ms, float) else str(page_ms)
+        cursor_txt = f"{cursor_ms:.1f}" if cursor_ms is not None else "fin des résultats"
+        print(f"{d:>6} {d * size:>9} {page_txt:>14} {cursor_txt:>11}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Benchmark from/size vs curseur sur /api/search")
+    p.add_argument("--api", default="http://localhost:8000")
+    p.add_argument("--size", type=int, default=100)
+    p.add_argument("--depths", type=int, nargs="+", default=[0, 10, 50, 99, 200, 500],
+                   help="numéros de page mesurés")
+    p.add_argument("--repeat", type=int, default=3, help="mesures from/size par profondeur (médiane)")
+    p.add_argument("--q", default=None)
+    p.add_argument("--primary-type", default=None)
+    p.add_argument("--district", default=None)
+    p.add_argument("--date-from", default=None)
+    p.add_argument("--date-to", default=None)
+    args = p.parse_args()
+    bench(args.api, args.size, args.depths,
+          {"q": args.q, "primary_type": args.primary_type, "district": args.district,
+           "date_from": args.date_from, "date_to": args.date_to},
+          args.repeat)
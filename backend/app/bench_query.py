@@ -0,0 +1,121 @@
+# bench_query.py
+"""
+Benchmark avant / après du constructeur de requêtes, directement sur ES :
+- avant : ancien corps de search(), tous les critères dans bool.must,
+  _source complet, total exact par défaut,
+- après : query_builder (filtres en contexte filter, projection des champs
+  de l'Explorer, track_total_hits plafonné).
+Les deux variantes reçoivent les mêmes paramètres normalisés et ciblent les
+mêmes champs : elles doivent trouver les mêmes documents (vérifié sur le
+total, un écart est signalé). Chaque recherche filtrée est jouée --repeat
+fois par variante, en alternance, après un tour d'échauffement ; affiche
+médiane / p95 (temps client et `took` ES), total et taille des réponses.
+"""
+# python bench_query.py
+# python bench_query.py --repeat 50 --index crimes_index
+import json
+import time
+import argparse
+import statistics
+
+from es_client import get_es_client
+from query_builder import normalize_params, search_body, parse_fields
+
+EXPLORER_FIELDS = "primary_type,description,date,location_description,block,district,victim_type_selected,Arrest"
+
+# recherches filtrées typiques de l'Explorer
+CASES = [
+    {"primary_type": "theft"},
+    {"district": "11"},
+    {"primary_type": "battery", "district": "6"},
+    {"date_from": "2024-03-01", "date_to": "2024-03-31"},
+    {"district": "4", "date_from": "2024-01-01", "date_to": "2024-06-30"},
+    {"q": "gun", "district": "7"},
+]
+
+
+def legacy_body(params, size=20, page=0):
+    """
+    Forme du corps produit par search() avant query_builder, sur les paramètres
+    normalisés (l'ancien filtre sur primary_type.keyword, absent du mapping,
+    ne trouvait rien : comparaison faite sur le même champ que la variante après).
+    """
+    must = []
+    if "q" in params:
+        must.append({"multi_match": {"query": params["q"],
+                                     "fields": ["primary_type^3", "description", "location_description"]}})
+    if "primary_type" in params:
+        must.append({"term": {"primary_type": params["primary_type"]}})
+    if "district" in params:
+        must.append({"term": {"district": params["district"]}})
+    if "date_from" in params or "date_to" in params:
+        range_q = {}
+        if "date_from" in params:
+            range_q["gte"] = params["date_from"]
+        if "date_to" in params:
+            range_q["lte"] = params["date_to"]
+        must.append({"range": {"date": range_q}})
+    body = {"query": {"bool": {"must": must}}} if must else {"query": {"match_all": {}}}
+    body["size"] = size
+    body["from"] = page * size
+    return body
+
+
+def new_body(params, size=20, total_cap=1000):
+    return search_body(params, size, fields=parse_fields(EXPLORER_FIELDS), total_cap=total_cap)
+
+
+def run(es, index, body):
+    t0 = time.perf_counter()
+    res = es.search(index=index, body=body)
+    ms = (time.perf_counter() - t0) * 1000
+    total = res["hits"].get("total") or {}
+    return ms, res["took"], len(json.dumps(res.body)), total
+
+
+def summarize(values):
+    values = sorted(values)
+    p95 = values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))]
+    return statistics.median(values), p95
+
+
+def bench(index="crimes_index", repeat=20, size=20, total_cap=1000):
+    es = get_es_client()
+    print(f"index={index}, {repeat} répétitions, size={size}, track_total_hits={total_cap}")
+    print(f"{'recherche':<52} {'variante':<6} {'méd ms':>7} {'p95 ms':>7} {'took':>6} "
+          f"{'total':>8} {'octets':>8}")
+    for case in CASES:
+        params = normalize_params(**case)
+        variants = [("avant", legacy_body(params, size)),
+                    ("après", new_body(params, size, total_cap))]
+        totals = {name: run(es, index, body)[3] for name, body in variants}   # échauffement
+        samples = {name: {"ms": [], "took": [], "bytes": 0} for name, _ in variants}
+        for _ in range(repeat):
+            for name, body in variants:
+                ms, took, nbytes, _ = run(es, index, body)
+                samples[name]["ms"].append(ms)
+                samples[name]["took"].append(took)
+                samples[name]["bytes"] = nbytes
+        label = ", ".join(f"{k}={v}" for k, v in case.items())
+        for name, _ in variants:
+            med, p95 = summarize(samples[name]["ms"])
+            took_med, _ = summarize(samples[name]["took"])
+            total = totals[name]
+            total_txt = f"{'≥' if total.get('relation') == 'gte' else ''}{total.get('value', '?')}"
+            print(f"{label:<52} {name:<6} {med:>7.1f} {p95:>7.1f} {took_med:>6.0f} "
+                  f"{total_txt:>8} {samples[name]['bytes']:>8}")
+            label = ""
+        # total exact avant, plafonné après : comparables jusqu'au plafond
+        before, after = totals["avant"].get("value"), totals["après"].get("value")
+        if before is not None and after is not None and min(before, total_cap) != min(after, total_cap):
+            print(f"⚠ Les deux variantes ne trouvent pas les mêmes documents ({before} / {after})")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Benchmark avant/après du constructeur de requêtes")
+    p.add_argument("--index", default="crimes_index")
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--size", type=int, default=20)
+    p.add_argument("--total-cap", type=int, default=1000, help="track_total_hits de la variante après")
+    args = p.parse_args()
+    bench(args.index, args.repeat, args.size, args.total_cap)
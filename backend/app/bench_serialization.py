@@ -0,0 +1,107 @@
+# bench_serialization.py
+"""
+Micro-benchmark du coût de sérialisation d'une page de /api/search, sans
+réseau ni ES : des hits synthétiques au format de l'index sont rendus par
+- défaut  : chemin FastAPI d'origine, jsonable_encoder + JSONResponse (json.dumps),
+- modèle  : validation SearchResponse puis rendu pydantic (VALIDATE_RESPONSES=1),
+- orjson  : FastJSONResponse sur le dict tel quel (trusted(), chemin par défaut).
+Affiche la médiane en µs par page et la taille rendue, pour 20 / 100 / 1000 hits.
+"""
+# python bench_serialization.py
+# python bench_serialization.py --sizes 20 100 1000 5000 --repeat 200
+import time
+import random
+import argparse
+import statistics
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from responses import FastJSONResponse
+from schemas import SearchResponse
+
+TYPES = ["theft", "battery", "criminal damage", "assault", "deceptive practice", "narcotics"]
+
+
+def fake_hit(i, rng):
+    """Hit au format de format_hit(), champs de l'index crimes_index."""
+    severity = rng.randint(1, 5)
+    return {
+        "id": f"{13000000 + i}",
+        "score": round(rng.random() * 10, 6),
+        "source": {
+            "id": f"{13000000 + i}",
+            "case_number": f"JH{100000 + i}",
+            "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00",
+            "block": f"0{rng.randint(10, 99)}XX W MADISON ST",
+            "primary_type": rng.choice(TYPES),
+            "description": "OVER $500",
+            "location_description": "STREET",
+            "Arrest": rng.random() < 0.2,
+            "Domestic": rng.random() < 0.15,
+            "district": str(rng.randint(1, 25)),
+            "hour": str(rng.randint(0, 23)),
+            "period_of_day": "night",
+            "severity": severity,
+            "severity_label": ["Very Low", "Low", "Medium", "High", "Very High"][severity - 1],
+            "severity_norm_row": rng.random(),
+            "risk_raw": rng.random() * 100,
+            "risk_level": rng.choice(["low", "medium", "high"]),
+            "victims_count": rng.randint(0, 3),
+            "victim_type_breakdown": {"physical": rng.randint(0, 2), "psychological": 0,
+                                      "property": rng.randint(0, 1)},
+            "victim_type_selected": "physical",
+            "geo": {"lat": 41.8 + rng.random() / 5, "lon": -87.7 + rng.random() / 5},
+        },
+    }
+
+
+def page(n, rng):
+    return {"total": 10000, "total_relation": "gte", "hits": [fake_hit(i, rng) for i in range(n)]}
+
+
+def render_default(payload):
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def render_model(payload):
+    model = SearchResponse.model_validate(payload)
+    return FastJSONResponse(model.model_dump(mode="json", exclude_unset=True)).body
+
+
+def render_orjson(payload):
+    return FastJSONResponse(payload).body
+
+
+VARIANTS = [("défaut", render_default), ("modèle", render_model), ("orjson", render_orjson)]
+
+
+def measure(fn, payload, repeat):
+    fn(payload)   # échauffement
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(payload)
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(samples)
+
+
+def bench(sizes=(20, 100, 1000), repeat=100, seed=42):
+    rng = random.Random(seed)
+    print(f"{repeat} répétitions par mesure")
+    print(f"{'hits':>6} {'variante':<8} {'méd µs':>10} {'octets':>10} {'gain':>6}")
+    for n in sizes:
+        payload = page(n, rng)
+        baseline = None
+        for name, fn in VARIANTS:
+            us = measure(fn, payload, repeat)
+            baseline = baseline or us
+            print(f"{n:>6} {name:<8} {us:>10.0f} {len(fn(payload)):>10} {baseline / us:>5.1f}x")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Coût de sérialisation d'une page de recherche")
+    p.add_argument("--sizes", type=int, nargs="+", default=[20, 100, 1000])
+    p.add_argument("--repeat", type=int, default=100)
+    args = p.parse_args()
+    bench(args.sizes, args.repeat)
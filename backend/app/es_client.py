@@ -1,15 +1,125 @@
 # es_client.py
-from elasticsearch import Elasticsearch
+"""
+Clients Elasticsearch de l'API et des benchmarks.
+- pool : ES_MAX_CONNECTIONS connexions par nœud, gardées ouvertes
+  ES_KEEPALIVE_S secondes au repos (pas de reconnexion à chaque rafale),
+- délais : ES_TIMEOUT secondes par requête ; un nœud lent ne bloque plus
+  indéfiniment un worker,
+- reprises : ES_MAX_RETRIES tentatives sur délai dépassé et 429/502/503/504 ;
+  un nœud en échec est écarté avec un backoff exponentiel
+  (ES_DEAD_NODE_BACKOFF, plafonné à ES_MAX_DEAD_NODE_BACKOFF secondes),
+- sniffing optionnel (ES_SNIFF=1) pour découvrir les nœuds d'un cluster,
+- client asynchrone instrumenté (ES_STATS) : requêtes en cours, latence,
+  connexions créées / réutilisées, lus par /health/deep.
+"""
+from elasticsearch import Elasticsearch, AsyncElasticsearch
+from elastic_transport import AiohttpHttpNode
 import os
+import time
+import asyncio
+import aiohttp
 from dotenv import load_dotenv
 
+from pool_monitor import BackendStats
+
 load_dotenv()
 
 ES_HOST = os.getenv("ES_HOST", "http://localhost:9200")
 ES_USER = os.getenv("ES_USER", None)
 ES_PASS = os.getenv("ES_PASS", None)
+# connexions HTTP simultanées vers ES : au-delà, les requêtes attendent une connexion libre
+ES_MAX_CONNECTIONS = int(os.getenv("ES_MAX_CONNECTIONS", "50"))
+ES_TIMEOUT = float(os.getenv("ES_TIMEOUT", "10"))
+ES_KEEPALIVE_S = float(os.getenv("ES_KEEPALIVE_S", "60"))
+ES_MAX_RETRIES = int(os.getenv("ES_MAX_RETRIES", "2"))
+ES_RETRY_ON_TIMEOUT = os.getenv("ES_RETRY_ON_TIMEOUT", "1").lower() in ("1", "true", "yes")
+ES_RETRY_ON_STATUS = (429, 502, 503, 504)
+ES_DEAD_NODE_BACKOFF = float(os.getenv("ES_DEAD_NODE_BACKOFF", "1"))
+ES_MAX_DEAD_NODE_BACKOFF = float(os.getenv("ES_MAX_DEAD_NODE_BACKOFF", "30"))
+ES_SNIFF = os.getenv("ES_SNIFF", "0").lower() in ("1", "true", "yes")
 
-def get_es_client():
+ES_STATS = BackendStats(ES_MAX_CONNECTIONS)
+
+# même réglage que la classe parente (contournement d'une fuite de sockets SSL
+# d'aiohttp) ; absent des versions plus anciennes d'elastic-transport
+try:
+    from elastic_transport._node._http_aiohttp import _NEEDS_CLEANUP_CLOSED
+except ImportError:
+    _NEEDS_CLEANUP_CLOSED = False
+
+
+class ObservedAiohttpNode(AiohttpHttpNode):
+    """
+    Nœud aiohttp avec keep-alive réglable et compteurs ES_STATS.
+    _create_aiohttp_session est une méthode privée d'elastic-transport,
+    recopiée de la version épinglée dans requirements.txt : à revoir à
+    chaque mise à jour.
+    """
+
+    def _create_aiohttp_session(self):
+        # mêmes réglages que la classe parente, plus keepalive_timeout et le suivi des connexions
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_create_end.append(self._on_connection_created)
+        trace.on_connection_reuseconn.append(self._on_connection_reused)
+        self.session = aiohttp.ClientSession(
+            headers=self.headers,
+            skip_auto_headers=("accept", "accept-encoding", "user-agent"),
+            auto_decompress=True,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            connector=aiohttp.TCPConnector(
+                limit_per_host=self._connections_per_node,
+                keepalive_timeout=ES_KEEPALIVE_S,
+                use_dns_cache=True,
+                enable_cleanup_closed=_NEEDS_CLEANUP_CLOSED,
+                ssl=self._ssl_context or False,
+            ),
+            trace_configs=[trace],
+        )
+
+    @staticmethod
+    async def _on_connection_created(session, ctx, params):
+        ES_STATS.connections_created += 1
+
+    @staticmethod
+    async def _on_connection_reused(session, ctx, params):
+        ES_STATS.connections_reused += 1
+
+    async def perform_request(self, *args, **kwargs):
+        ES_STATS.start()
+        t0 = time.perf_counter()
+        error = True
+        try:
+            response = await super().perform_request(*args, **kwargs)
+            error = response[0].status >= 500
+            return response
+        finally:
+            ES_STATS.done((time.perf_counter() - t0) * 1000, error)
+
+
+def _client_options():
+    options = {
+        "connections_per_node": ES_MAX_CONNECTIONS,
+        "request_timeout": ES_TIMEOUT,
+        "max_retries": ES_MAX_RETRIES,
+        "retry_on_timeout": ES_RETRY_ON_TIMEOUT,
+        "retry_on_status": ES_RETRY_ON_STATUS,
+        "dead_node_backoff_factor": ES_DEAD_NODE_BACKOFF,
+        "max_dead_node_backoff": ES_MAX_DEAD_NODE_BACKOFF,
+    }
+    if ES_SNIFF:
+        options.update(sniff_on_start=True, sniff_on_node_failure=True,
+                       min_delay_between_sniffing=60)
     if ES_USER and ES_PASS:
-        return Elasticsearch(ES_HOST, basic_auth=(ES_USER, ES_PASS))
-    return Elasticsearch(ES_HOST)
+        options["basic_auth"] = (ES_USER, ES_PASS)
+    return options
+
+
+def get_es_client():
+    return Elasticsearch(ES_HOST, **_client_options())
+
+
+def get_async_es_client():
+    """Client asynchrone (aiohttp), à créer dans la boucle d'événements de l'API."""
+    return AsyncElasticsearch(ES_HOST, node_class=ObservedAiohttpNode, **_client_options())
@@ -0,0 +1,119 @@
+# geo_query.py
+"""
+Agrégations spatiales sur le champ geo (geo_point) :
+- tuiles z/x/y (schéma web mercator des cartes) : geotile_grid à
+  z + TILE_DETAIL, limité au rectangle de la tuile,
+- heatmap d'un rectangle lon/lat quelconque : geohash_grid.
+Les mêmes filtres que la recherche (query_builder) s'appliquent, en contexte
+filter. Les réponses sont des tableaux compacts [x, y, n] / [lat, lon, n].
+"""
+import os
+import math
+
+# niveaux de détail sous la tuile : 2**6 = 64 cellules par côté au plus
+TILE_DETAIL = int(os.getenv("GEO_TILE_DETAIL", "6"))
+MAX_ZOOM = 29               # précision maximale de geotile_grid
+GEO_MAX_BUCKETS = int(os.getenv("GEO_MAX_BUCKETS", "10000"))
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def tile_bounds(z, x, y):
+    """Rectangle (top, left, bottom, right) en degrés de la tuile z/x/y."""
+    n = 2 ** z
+    if not (0 <= z <= MAX_ZOOM and 0 <= x < n and 0 <= y < n):
+        raise ValueError(f"Invalid tile {z}/{x}/{y}")
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat(y), x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0
+
+
+def parse_bbox(bbox):
+    """"min_lon,min_lat,max_lon,max_lat" -> tuple de floats validée."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise ValueError(f"Invalid bbox {bbox!r}, expected min_lon,min_lat,max_lon,max_lat")
+    if not (-180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise ValueError(f"Invalid bbox {bbox!r}")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def geo_filter(top, left, bottom, right):
+    return {"geo_bounding_box": {"geo": {
+        "top_left": {"lat": top, "lon": left},
+        "bottom_right": {"lat": bottom, "lon": right},
+    }}}
+
+
+def with_filter(query, extra):
+    """Ajoute `extra` au contexte filter d'une requête build_query()."""
+    if "bool" not in query:
+        return {"bool": {"filter": [extra]}}
+    bool_q = dict(query["bool"])
+    bool_q["filter"] = bool_q.get("filter", []) + [extra]
+    return {"bool": bool_q}
+
+
+def tile_body(query, z, x, y):
+    top, left, bottom, right = tile_bounds(z, x, y)
+    precision = min(z + TILE_DETAIL, MAX_ZOOM)
+    return precision, {
+        "size": 0,
+        "track_total_hits": False,
+        "query": with_filter(query, geo_filter(top, left, bottom, right)),
+        "aggs": {"cells": {"geotile_grid": {
+            "field": "geo", "precision": precision, "size": GEO_MAX_BUCKETS,
+            "bounds": {"top_left": {"lat": top, "lon": left},
+                       "bottom_right": {"lat": bottom, "lon": right}},
+        }}},
+    }
+
+
+def tile_cells(aggs):
+    """Buckets geotile "z/x/y" -> [[x, y, n], ...]."""
+    cells = []
+    for b in aggs["cells"]["buckets"]:
+        _, cx, cy = b["key"].split("/")
+        cells.append([int(cx), int(cy), b["doc_count"]])
+    return cells
+
+
+def heatmap_body(query, bbox, precision):
+    left, bottom, right, top = bbox
+    return {
+        "size": 0,
+        "track_total_hits": False,
+        "query": with_filter(query, geo_filter(top, left, bottom, right)),
+        "aggs": {"cells": {"geohash_grid": {
+            "field": "geo", "precision": precision, "size": GEO_MAX_BUCKETS,
+        }}},
+    }
+
+
+def geohash_center(gh):
+    """Centre (lat, lon) d'une cellule geohash."""
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    even = True
+    for ch in gh:
+        bits = GEOHASH_BASE32.index(ch)
+        for shift in range(4, -1, -1):
+            bit = (bits >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                lon_lo, lon_hi = (mid, lon_hi) if bit else (lon_lo, mid)
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                lat_lo, lat_hi = (mid, lat_hi) if bit else (lat_lo, mid)
+            even = not even
+    return (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+
+
+def heatmap_cells(aggs):
+    """Buckets geohash -> [[lat, lon, n], ...] (centre de cellule, 6 décimales)."""
+    cells = []
+    for b in aggs["cells"]["buckets"]:
+        lat, lon = geohash_center(b["key"])
+        cells.append([round(lat, 6), round(lon, 6), b["doc_count"]])
+    return cells
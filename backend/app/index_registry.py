@@ -0,0 +1,131 @@
+# index_registry.py
+"""
+Registre des index / alias Elasticsearch connus de l'API.
+Remplace l'appel es.indices.exists avant chaque requête :
+- au démarrage, un seul _resolve/index charge tous les noms (index + alias)
+  et vérifie ceux dont l'API a besoin,
+- le résultat est gardé INDEX_REGISTRY_TTL secondes et rafraîchi en tâche de
+  fond ; un nom inconnu déclenche au plus un rafraîchissement immédiat par
+  INDEX_REGISTRY_MIN_REFRESH secondes (index créé entre deux passages),
+- ES injoignable : les tentatives sont espacées (backoff doublé à chaque
+  échec, plafonné à INDEX_REGISTRY_TTL) et, tant qu'aucun nom n'est connu,
+  exists() répond None sans attendre ES (503 côté API),
+- les compteurs (stats) montrent les allers-retours ES évités.
+"""
+import os
+import time
+import asyncio
+
+INDEX_REGISTRY_TTL = float(os.getenv("INDEX_REGISTRY_TTL", "30"))
+INDEX_REGISTRY_MIN_REFRESH = float(os.getenv("INDEX_REGISTRY_MIN_REFRESH", "1"))
+
+
+class IndexRegistry:
+    def __init__(self, es, required=(), ttl=INDEX_REGISTRY_TTL,
+                 min_refresh=INDEX_REGISTRY_MIN_REFRESH):
+        self.es = es
+        self.required = tuple(required)
+        self.ttl = ttl
+        self.min_refresh = min_refresh
+        self.names = None           # None : jamais chargé (ES injoignable au démarrage)
+        self.loaded_at = 0.0
+        self.attempted_at = None    # dernière tentative, réussie ou non
+        self.attempts = 0
+        self.backoff = min_refresh
+        self.lock = asyncio.Lock()
+        self.task = None
+        self.counters = {"lookups": 0, "cache_hits": 0, "refreshes": 0,
+                         "refresh_errors": 0, "refresh_ms_total": 0.0,
+                         "not_found": 0}
+
+    async def start(self):
+        await self.refresh()
+        if self.names is not None:
+            missing = [n for n in self.required if n not in self.names]
+            if missing:
+                print(f"⚠ Index / alias introuvables au démarrage : {', '.join(missing)}")
+            else:
+                print(f"✔ Index vérifiés : {', '.join(self.required)}")
+        self.task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.ttl)
+            await self.refresh()
+
+    async def refresh(self, seen=None):
+        """
+        Recharge tous les noms d'index et d'alias en un seul appel. Avec `seen`
+        (self.attempts lu par l'appelant), rien à faire si une autre tentative
+        a eu lieu entre-temps : les requêtes en attente du verrou réutilisent
+        son résultat au lieu d'enchaîner les appels.
+        """
+        async with self.lock:
+            if seen is not None and self.attempts != seen:
+                return
+            start = time.perf_counter()
+            try:
+                res = await self.es.indices.resolve_index(name="*")
+            except Exception as e:
+                self.attempts += 1
+                self.attempted_at = time.monotonic()
+                self.backoff = min(self.backoff * 2, self.ttl)
+                self.counters["refresh_errors"] += 1
+                print(f"⚠ Rafraîchissement du registre d'index impossible : {e!r}")
+                return
+            names = set()
+            for key in ("indices", "aliases", "data_streams"):
+                names.update(item["name"] for item in res.get(key, []))
+            self.names = names
+            self.attempts += 1
+            self.loaded_at = self.attempted_at = time.monotonic()
+            self.backoff = self.min_refresh
+            self.counters["refreshes"] += 1
+            self.counters["refresh_ms_total"] += (time.perf_counter() - start) * 1000
+
+    async def exists(self, name):
+        """
+        Existence d'un index ou alias, sans appel ES dans le cas courant.
+        None : registre jamais chargé et ES injoignable, existence inconnue.
+        """
+        self.counters["lookups"] += 1
+        if self.names is not None and name in self.names:
+            self.counters["cache_hits"] += 1
+            return True
+        # nom inconnu (ou registre vide) : rafraîchir au plus une fois par
+        # min_refresh, ou par backoff après un échec
+        due = self.attempted_at is None or time.monotonic() - self.attempted_at >= self.backoff
+        if due and not (self.names is None and self.lock.locked()):
+            await self.refresh(seen=self.attempts)
+        elif self.names is not None:
+            self.counters["cache_hits"] += 1
+        # sinon registre vide et rafraîchissement en cours : ne pas faire la queue derrière
+        if self.names is None:
+            return None
+        return name in self.names
+
+    def forget(self, name):
+        """L'index a disparu (index_not_found sur une requête) : le retirer du cache."""
+        self.counters["not_found"] += 1
+        if self.names is not None:
+            self.names.discard(name)
+
+    def stats(self):
+        c = dict(self.counters)
+        refreshes = c["refreshes"]
+        avg_ms = c.pop("refresh_ms_total") / refreshes if refreshes else 0.0
+        c["avg_refresh_ms"] = round(avg_ms, 2)
+        c["age_s"] = round(time.monotonic() - self.loaded_at, 1) if self.names is not None else None
+        c["known"] = len(self.names) if self.names is not None else 0
+        # chaque lookup servi par le cache évite un es.indices.exists
+        c["saved_round_trips"] = c["cache_hits"]
+        c["est_saved_ms"] = round(c["cache_hits"] * avg_ms, 1)
+        return c
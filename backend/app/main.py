@@ -1,37 +1,86 @@
 # main.py
-from fastapi import FastAPI, HTTPException, Query
-from typing import Optional
-from es_client import get_es_client
-from pydantic import BaseModel
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from elasticsearch import BadRequestError, NotFoundError
+import pymongo
+from typing import Optional, Literal
+from es_client import get_async_es_client, ES_STATS
+from mongo_client import get_async_mongo_client, MONGO_DB, MONGO_COLL, MONGO_POOL
+from pool_monitor import RequestCounter, InFlightMiddleware
+from index_registry import IndexRegistry
+from response_cache import GenerationWatcher, ResponseCache
+from query_builder import (SEARCH_TOTAL_CAP, normalize_params, search_body, parse_fields,
+                           build_query, source_includes, parse_facets, facet_counts)
+from rollup_query import ROLLUP_COLLECTIONS, rollup_match, rollup_pipeline
+from tile_cache import TileCache
+from suggest import SUGGEST_CACHE_BYTES, normalize_prefix, suggest_body, suggestion_texts
+from timeseries import (INTERVALS, SPLIT_FIELDS, can_use_rollups, rollup_collection,
+                        rollup_timeseries_pipeline, rollup_points, es_timeseries_body,
+                        es_points, compress)
+from geo_query import tile_body, tile_cells, heatmap_body, heatmap_cells, parse_bbox
+from schemas import (CrimeResult, SearchResponse, CrimeBatchRequest, CrimeBatchResponse,
+                     SummaryResponse)
+from responses import FastJSONResponse, json_bytes, trusted
+import io
+import time
+import asyncio
 import os
+import csv
+import json
+import base64
+import hashlib
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
-from pymongo import MongoClient
 
-from datetime import datetime
 
-def parse_date(d, start=True):
-    if not d:
-        return None
-    dt = datetime.strptime(d, "%Y-%m-%d")
-    if start:
-        return dt.isoformat() + "Z"  # UTC début de journée
-    else:
-        dt = dt.replace(hour=23, minute=59, second=59)
-        return dt.isoformat() + "Z"  # UTC fin de journée
+load_dotenv()
+ES_INDEX = os.getenv("ES_INDEX", "crimes_index")
+# index / alias vérifiés au démarrage, en plus de ES_INDEX (séparés par des virgules)
+ES_REQUIRED_INDICES = [ES_INDEX] + [
+    n.strip() for n in os.getenv("ES_REQUIRED_INDICES", "").split(",") if n.strip()
+]
 
-# Connexion MongoDB
-mongo_client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
-mongo_db = mongo_client["city_safety"]
-mongo_collection = mongo_db["crime"]
+# délai des sondes de /health/deep
+HEALTH_TIMEOUT_S = float(os.getenv("HEALTH_TIMEOUT_S", "2"))
 
+# Clients asynchrones créés au démarrage, dans la boucle d'événements de l'API
+es = None
+mongo_client = None
+mongo_collection = None
+index_registry = None
+generation = None
+response_cache = None
+tile_cache = None
+suggest_cache = None
 
-load_dotenv()
-ES_INDEX = os.getenv("ES_INDEX", "crimes_index")
 
-es = get_es_client()
+@asynccontextmanager
+async def lifespan(app):
+    global es, mongo_client, mongo_collection, index_registry, generation, response_cache, tile_cache, \
+        suggest_cache
+    es = get_async_es_client()
+    mongo_client = get_async_mongo_client()
+    mongo_collection = mongo_client[MONGO_DB][MONGO_COLL]
+    index_registry = IndexRegistry(es, ES_REQUIRED_INDICES)
+    generation = GenerationWatcher(mongo_client[MONGO_DB])
+    try:
+        await index_registry.start()
+        await generation.start()
+        response_cache = ResponseCache(generation)
+        tile_cache = TileCache(generation)
+        suggest_cache = TileCache(generation, max_bytes=SUGGEST_CACHE_BYTES)
+        yield
+    finally:
+        # tâches de fond d'abord (elles utilisent les clients), puis les pools
+        await generation.stop()
+        await index_registry.stop()
+        await es.close()
+        await mongo_client.close()
+
 
-app = FastAPI(title="CitySafety API")
+app = FastAPI(title="CitySafety API", lifespan=lifespan,
+              default_response_class=FastJSONResponse)
 
 # Allow local frontend dev
 app.add_middleware(
@@ -41,159 +90,596 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# requêtes HTTP en cours, pour /health/deep
+http_requests = RequestCounter()
+app.add_middleware(InFlightMiddleware, counter=http_requests)
+
+def is_index_pattern(name):
+    """Motif (joker, exclusion, date math) : résolu par ES lui-même."""
+    return any(c in name for c in "*?<") or name.startswith("-")
+
+
+async def require_index(index):
+    """
+    404 si un index / alias nommé n'existe pas, d'après le registre (pas d'appel
+    ES) ; les listes séparées par des virgules sont vérifiées nom par nom et
+    les motifs transmis tels quels à ES. 503 si ES est injoignable.
+    """
+    names = [n.strip() for n in index.split(",")]
+    if not all(names):
+        raise HTTPException(status_code=400, detail="Empty index name")
+    for name in names:
+        if is_index_pattern(name):
+            continue
+        found = await index_registry.exists(name)
+        if found is None:
+            raise HTTPException(status_code=503, detail="Elasticsearch unavailable")
+        if not found:
+            raise HTTPException(status_code=404, detail="Index not found")
+
+
+@app.exception_handler(NotFoundError)
+async def es_not_found(request: Request, exc: NotFoundError):
+    # index supprimé depuis le dernier rafraîchissement du registre
+    if exc.error == "index_not_found_exception":
+        err = exc.body.get("error", {}) if isinstance(exc.body, dict) else {}
+        index_registry.forget(err.get("index"))
+        return JSONResponse(status_code=404, content={"detail": "Index not found"})
+    return JSONResponse(status_code=404, content={"detail": str(exc)})
 
-# Utility: convert severity numeric -> label
-SEVERITY_LABEL = {
-    5: "Very High",
-    4: "High",
-    3: "Medium",
-    2: "Low",
-    1: "Very Low"
-}
-def severity_label(v):
-    try:
-        return SEVERITY_LABEL.get(int(v), str(v))
-    except:
-        return v
 
 @app.get("/")
-def health():
+async def health():
     return {"ok": True}
 
+async def probe(check):
+    """(ok, latence ms, erreur) d'un aller-retour borné par HEALTH_TIMEOUT_S."""
+    t0 = time.perf_counter()
+    try:
+        await asyncio.wait_for(check(), HEALTH_TIMEOUT_S)
+        return True, round((time.perf_counter() - t0) * 1000, 2), None
+    except Exception as e:
+        return False, round((time.perf_counter() - t0) * 1000, 2), repr(e)
+
+
+@app.get("/health/deep")
+async def health_deep():
+    """Latence des backends, utilisation des pools et requêtes en cours ; 503 si un backend est KO."""
+    (es_ok, es_ms, es_err), (mongo_ok, mongo_ms, mongo_err) = await asyncio.gather(
+        probe(lambda: es.options(max_retries=0).info()),
+        probe(lambda: mongo_client.admin.command("ping")),
+    )
+    report = {
+        "status": "ok" if es_ok and mongo_ok else "degraded",
+        "api": http_requests.snapshot(),
+        "elasticsearch": {"ok": es_ok, "latency_ms": es_ms, "error": es_err,
+                          "nodes": len(es.transport.node_pool.all()), **ES_STATS.snapshot()},
+        "mongodb": {"ok": mongo_ok, "latency_ms": mongo_ms, "error": mongo_err,
+                    **MONGO_POOL.snapshot()},
+    }
+    return FastJSONResponse(report, status_code=200 if report["status"] == "ok" else 503)
+
+
+@app.get("/api/metrics")
+async def metrics():
+    return {"index_registry": index_registry.stats(), "response_cache": response_cache.stats(),
+            "tile_cache": tile_cache.stats(), "suggest_cache": suggest_cache.stats()}
+
 @app.get("/api/count")
-def count_index(index: str = ES_INDEX):
-    if not es.indices.exists(index=index):
-        raise HTTPException(status_code=404, detail="Index not found")
-    c = es.count(index=index)
+async def count_index(index: str = ES_INDEX):
+    await require_index(index)
+    c = await es.count(index=index)
     return {"count": c.get("count", 0)}
 
-@app.get("/api/crime/{doc_id}")
-def get_crime(doc_id: str, index: str = ES_INDEX):
+@app.get("/api/crime/{doc_id}", response_model=CrimeResult)
+async def get_crime(doc_id: str, index: str = ES_INDEX):
     try:
-        res = es.get(index=index, id=doc_id)
-        src = res.get("_source", {})
-        # nicer severity label
-        if "severity" in src:
-            src["severity_label"] = severity_label(src["severity"])
-        return {"id": res.get("_id"), "source": src}
+        # severity_label & co. sont calculés à l'indexation (data/transform.py)
+        res = await es.get(index=index, id=doc_id)
+        return trusted({"id": res.get("_id"), "source": res.get("_source", {})})
     except Exception as e:
         raise HTTPException(status_code=404, detail=str(e))
 
-@app.get("/api/search")
-def search(
+
+# ids acceptés par appel de /api/crimes/batch
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "100"))
+
+
+@app.post("/api/crimes/batch", response_model=CrimeBatchResponse, response_model_exclude_none=True)
+async def get_crimes_batch(req: CrimeBatchRequest, index: str = ES_INDEX):
+    """Plusieurs documents en un seul mget ; statut par id, dans l'ordre demandé."""
+    ids = list(dict.fromkeys(i.strip() for i in req.ids if i.strip()))
+    if not ids:
+        raise HTTPException(status_code=400, detail="No ids")
+    if len(ids) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Too many ids ({len(ids)} > {BATCH_MAX_IDS})")
+    await require_index(index)
+    names = parse_fields(req.fields)
+    kwargs = {"source_includes": source_includes(names)} if names else {}
+    res = await es.mget(index=index, ids=ids, **kwargs)
+
+    results = []
+    found = 0
+    for doc in res["docs"]:
+        if doc.get("found"):
+            found += 1
+            results.append({"id": doc["_id"], "status": "found", "source": doc.get("_source", {})})
+        elif "error" in doc:
+            err = doc["error"]
+            results.append({"id": doc["_id"], "status": "error",
+                            "error": err.get("reason", str(err)) if isinstance(err, dict) else str(err)})
+        else:
+            results.append({"id": doc["_id"], "status": "not_found"})
+    return trusted({"requested": len(ids), "found": found, "results": results})
+
+
+@app.get("/api/suggest")
+async def suggest(
+    prefix: str = Query(..., description="début du texte saisi"),
+    size: int = Query(8, ge=1, le=20),
+    index: str = ES_INDEX,
+):
+    """Saisie semi-automatique : suggester completion, préfixes chauds en LRU."""
+    p = normalize_prefix(prefix)
+    if not p:
+        return {"prefix": p, "suggestions": []}
+    await require_index(index)
+
+    async def compute():
+        try:
+            res = await es.search(index=index, body=suggest_body(p, size))
+        except BadRequestError as e:
+            # index créé avant le champ completion "suggest" : pas de suggester possible
+            if "suggest" not in str(e.body):
+                raise
+            raise HTTPException(status_code=409,
+                                detail=f"Index {index} has no suggest completion field, reindex it")
+        return json_bytes({"prefix": p, "suggestions": suggestion_texts(res)})
+
+    data, hit = await suggest_cache.get((index, p, size), compute)
+    return FastJSONResponse(data, headers={"X-Suggest-Cache": "hit" if hit else "miss"})
+
+
+# -------------------------------------------------
+# Pagination par curseur : point-in-time + search_after
+# Le tri (date, id) est stable ; ES ajoute _shard_doc comme départage.
+# -------------------------------------------------
+PIT_KEEP_ALIVE = os.getenv("SEARCH_PIT_KEEP_ALIVE", "2m")
+# au-delà, from/size est refusé par ES (index.max_result_window)
+MAX_RESULT_WINDOW = int(os.getenv("ES_MAX_RESULT_WINDOW", "10000"))
+CURSOR_SORT = [{"date": {"order": "desc"}}, {"id": {"order": "desc"}}]
+
+
+def encode_cursor(state):
+    raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        state = json.loads(raw)
+        return state["pit"], state["after"], state["sig"], state["total"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def filters_signature(*params):
+    """Empreinte des filtres : un curseur n'est valable que pour la même recherche."""
+    raw = json.dumps(params, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+async def search_cursor_page(index, body, cursor, sig):
+    if cursor:
+        pit, after, cursor_sig, total = decode_cursor(cursor)
+        if cursor_sig != sig:
+            raise HTTPException(status_code=400, detail="Cursor does not match the search filters")
+    else:
+        res = await es.open_point_in_time(index=index, keep_alive=PIT_KEEP_ALIVE)
+        pit, after, total = res["id"], None, None
+
+    body.pop("from", None)
+    body["sort"] = CURSOR_SORT
+    body["pit"] = {"id": pit, "keep_alive": PIT_KEEP_ALIVE}
+    if after is not None:
+        body["search_after"] = after
+        body["track_total_hits"] = False   # total calculé sur la première page
+    try:
+        res = await es.search(body=body)
+    except NotFoundError as e:
+        if e.error == "search_context_missing_exception":
+            raise HTTPException(status_code=410, detail="Cursor expired")
+        raise
+
+    hits = res["hits"]["hits"]
+    if total is None:
+        total = res["hits"].get("total") or {}   # absent avec total_cap=0
+    next_cursor = None
+    if hits and len(hits) == body["size"]:
+        next_cursor = encode_cursor({"pit": res.get("pit_id", pit), "after": hits[-1]["sort"],
+                                     "sig": sig, "total": total})
+    else:
+        # dernière page : libérer le point-in-time sans attendre keep_alive
+        await es.close_point_in_time(id=res.get("pit_id", pit))
+    return total, hits, next_cursor, res.get("aggregations")
+
+
+def search_params(q, primary_type, district, date_from, date_to):
+    try:
+        return normalize_params(q, primary_type, district, date_from, date_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def format_hit(h):
+    return {"id": h["_id"], "score": h["_score"], "source": h["_source"]}
+
+
+@app.get("/api/search", response_model=SearchResponse, response_model_exclude_unset=True)
+async def search(
     q: Optional[str] = Query(None, description="text search on primary_type/description"),
     primary_type: Optional[str] = Query(None),
     district: Optional[str] = Query(None),
     date_from: Optional[str] = Query(None, description="YYYY-MM-DD"),
     date_to: Optional[str] = Query(None, description="YYYY-MM-DD"),
-    size: int = 20,
-    page: int = 0,
+    size: int = Query(20, ge=1, le=MAX_RESULT_WINDOW),
+    page: int = Query(0, ge=0),
+    paginate: Literal["page", "cursor"] = Query(
+        "page", description="page: from/size (shallow pages), cursor: point-in-time + search_after"),
+    cursor: Optional[str] = Query(
+        None, description="next_cursor of the previous page (implies paginate=cursor)"),
+    fields: Optional[str] = Query(None, description="comma-separated fields to return"),
+    total_cap: int = Query(SEARCH_TOTAL_CAP, ge=0,
+                           description="count hits exactly up to this value (0: no count)"),
+    facets: Optional[str] = Query(
+        None, description="comma-separated facets to count (primary_type, district, period_of_day, "
+                          "risk_level, year), each ignoring its own filter"),
     index: str = ES_INDEX
 ):
-    if not es.indices.exists(index=index):
-        raise HTTPException(status_code=404, detail="Index not found")
-
-    must = []
-
-    # Nettoyage q
-    if q:
-        q_clean = q.strip()
-        if q_clean:
-            must.append({
-                "multi_match": {
-                    "query": q_clean,
-                    "fields": ["primary_type^3", "description", "location_description"]
-                }
-            })
-
-    # Filter primary_type
-    if primary_type:
-        pt_clean = primary_type.strip()
-        if pt_clean:
-            must.append({"term": {"primary_type.keyword": pt_clean}})
-
-    # Filter district
-    if district:
-        try:
-            dval = int(district)
-            must.append({"term": {"district": dval}})
-        except:
-            pass
-
-    # Filter date range
-    # Filter date range
-    # Dans ta fonction search()
-    if date_from or date_to:
-        range_q = {}
-        if date_from:
-            range_q["gte"] = parse_date(date_from, start=True)
-        if date_to:
-            range_q["lte"] = parse_date(date_to, start=False)
-        must.append({"range": {"date": range_q}})
-
-    body = {"query": {"bool": {"must": must}}} if must else {"query": {"match_all": {}}}
-    body["size"] = size
-    body["from"] = page * size
-
-    res = es.search(index=index, body=body)
-    hits = []
-    for h in res["hits"]["hits"]:
-        src = h["_source"]
-        if "severity" in src:
-            src["severity_label"] = severity_label(src["severity"])
-        vt = src.get("victim_type_breakdown", {})
-        if isinstance(vt, dict):
-            chosen = None
-            for k in ["physical", "psychological", "property"]:
-                if vt.get(k) and int(vt.get(k)) > 0:
-                    chosen = k
-                    break
-            src["victim_type_selected"] = chosen
-        hits.append({"id": h["_id"], "score": h["_score"], "source": src})
-
-    return {"total": res["hits"]["total"]["value"], "hits": hits}
-
-
-@app.get("/api/aggregations/summary")
-def summary(index: str = ES_INDEX):
-    # some useful aggregates: incidents per hour, per type, arrests %
-    if not es.indices.exists(index=index):
-        raise HTTPException(status_code=404, detail="Index not found")
-    body = {
-        "size": 0,
-        "aggs": {
-            "by_hour": {"terms": {"field": "hour", "size": 24, "order": {"_key": "asc"}}},
-            "by_type": {"terms": {"field": "primary_type", "size": 20}},
-            "arrest_stats": {
-                "terms": {"field": "Arrest"}
-            }
+    await require_index(index)
+    params = search_params(q, primary_type, district, date_from, date_to)
+    names = parse_fields(fields)
+    try:
+        facet_names = parse_facets(facets)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if cursor or paginate == "cursor":
+        # facettes sur la première page seulement : les suivantes ne changent pas les compteurs
+        body = search_body(params, size, fields=names, total_cap=total_cap,
+                           facets=None if cursor else facet_names)
+        sig = filters_signature(params, size, index)
+        total, raw_hits, next_cursor, aggs = await search_cursor_page(index, body, cursor, sig)
+        hits = [format_hit(h) for h in raw_hits]
+        payload = {"total": total.get("value"), "total_relation": total.get("relation", "eq"),
+                   "hits": hits, "next_cursor": next_cursor}
+        if aggs and facet_names:
+            payload["facets"] = facet_counts(aggs, facet_names)
+        return trusted(payload)
+
+    if (page + 1) * size > MAX_RESULT_WINDOW:
+        raise HTTPException(status_code=400,
+                            detail=f"Page beyond {MAX_RESULT_WINDOW} results, use paginate=cursor")
+    body = search_body(params, size, page * size, fields=names, total_cap=total_cap,
+                       facets=facet_names)
+    res = await es.search(index=index, body=body)
+    hits = [format_hit(h) for h in res["hits"]["hits"]]
+    total = res["hits"].get("total") or {}   # absent avec total_cap=0
+    payload = {"total": total.get("value"), "total_relation": total.get("relation", "eq"),
+               "hits": hits}
+    if facet_names:
+        payload["facets"] = facet_counts(res["aggregations"], facet_names)
+    return trusted(payload)
+
+
+# -------------------------------------------------
+# Export en flux : mêmes filtres que search(), parcours complet par
+# point-in-time, une page en mémoire à la fois
+# -------------------------------------------------
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+# colonnes CSV par défaut (sans fields=) ; les objets imbriqués sont écrits en JSON
+EXPORT_COLUMNS = [
+    "id", "case_number", "date", "block", "IUCR", "primary_type", "description",
+    "location_description", "Arrest", "Domestic", "district", "community_area",
+    "fbi_code", "x_coord", "y_coord", "year", "hour", "period_of_day", "severity",
+    "severity_label", "victims_count", "victim_type_breakdown", "victim_type_selected",
+    "severity_norm_row", "risk_raw", "risk_location_score", "risk_level", "geo",
+]
+async def iter_export_hits(index, body):
+    """Tous les hits de la requête, page par page (PIT + search_after sur _shard_doc)."""
+    pit = (await es.open_point_in_time(index=index, keep_alive=PIT_KEEP_ALIVE))["id"]
+    body.pop("from", None)
+    body["sort"] = ["_shard_doc"]
+    body["track_total_hits"] = False
+    try:
+        while True:
+            body["pit"] = {"id": pit, "keep_alive": PIT_KEEP_ALIVE}
+            res = await es.search(body=body)
+            pit = res.get("pit_id", pit)
+            hits = res["hits"]["hits"]
+            if not hits:
+                break
+            yield hits
+            if len(hits) < body["size"]:
+                break
+            body["search_after"] = hits[-1]["sort"]
+    finally:
+        await es.close_point_in_time(id=pit)
+
+
+def export_row(h, names):
+    row = {"id": h["_id"], **h.get("_source", {})}
+    if names:
+        row = {n: row.get(n) for n in names}
+    return row
+
+
+def csv_cell(v):
+    if isinstance(v, (dict, list)):
+        return json.dumps(v, ensure_ascii=False)
+    return v
+
+
+@app.get("/api/export")
+async def export(
+    q: Optional[str] = Query(None, description="text search on primary_type/description"),
+    primary_type: Optional[str] = Query(None),
+    district: Optional[str] = Query(None),
+    date_from: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    date_to: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    format: Literal["ndjson", "csv"] = "ndjson",
+    fields: Optional[str] = Query(None, description="comma-separated fields to export"),
+    index: str = ES_INDEX
+):
+    await require_index(index)
+    params = search_params(q, primary_type, district, date_from, date_to)
+    names = parse_fields(fields)
+    body = search_body(params, EXPORT_PAGE_SIZE, fields=names, total_cap=None)
+
+    async def ndjson_chunks():
+        async for hits in iter_export_hits(index, body):
+            yield "".join(json.dumps(export_row(h, names), ensure_ascii=False) + "\n"
+                          for h in hits)
+
+    async def csv_chunks():
+        columns = names or EXPORT_COLUMNS
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        async for hits in iter_export_hits(index, body):
+            for h in hits:
+                writer.writerow({k: csv_cell(v) for k, v in export_row(h, names).items()})
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+        if buf.tell():
+            yield buf.getvalue()   # en-tête seul si aucun résultat
+
+    if format == "csv":
+        chunks, media_type = csv_chunks(), "text/csv; charset=utf-8"
+    else:
+        chunks, media_type = ndjson_chunks(), "application/x-ndjson"
+    filename = f"crimes_export.{format}"
+    return StreamingResponse(chunks, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+# some useful aggregates: incidents per hour, per type, arrests %
+SUMMARY_BODY = {
+    "size": 0,
+    "aggs": {
+        "by_hour": {"terms": {"field": "hour", "size": 24, "order": {"_key": "asc"}}},
+        "by_type": {"terms": {"field": "primary_type", "size": 20}},
+        "arrest_stats": {
+            "terms": {"field": "Arrest"}
         }
     }
-    res = es.search(index=index, body=body)
-    return res["aggregations"]
+}
+
+
+@app.get("/api/aggregations/summary", response_model=SummaryResponse)
+async def summary(index: str = ES_INDEX):
+    await require_index(index)
+
+    async def compute():
+        res = await es.search(index=index, body=SUMMARY_BODY)
+        return res["aggregations"]
+
+    return trusted(await response_cache.get(("summary", index), compute))
+
+
+# parcours complet de la collection : délai propre, au-delà du timeoutMS global (mongo_client.py)
+MONGO_SUMMARY_TIMEOUT_S = float(os.getenv("MONGO_SUMMARY_TIMEOUT_S", "120"))
+MONGO_SUMMARY_PIPELINE = [
+    {
+        "$group": {
+            "_id": None,
+            "uniqueTypes": {"$addToSet": "$primary_type"},
+            "uniqueDistricts": {"$addToSet": "$district"}
+        }
+    },
+    {
+        "$project": {
+            "_id": 0,
+            "totalTypes": {"$size": "$uniqueTypes"},
+            "totalDistricts": {"$size": "$uniqueDistricts"}
+        }
+    }
+]
+
 
 @app.get("/api/mongo_summary")
-def mongo_summary():
+async def mongo_summary():
     """Total de districts et types de crimes uniques depuis MongoDB"""
-    pipeline = [
-        {
-            "$group": {
-                "_id": None,
-                "uniqueTypes": {"$addToSet": "$primary_type"},
-                "uniqueDistricts": {"$addToSet": "$district"}
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "totalTypes": {"$size": "$uniqueTypes"},
-                "totalDistricts": {"$size": "$uniqueDistricts"}
-            }
-        }
-    ]
-    result = list(mongo_collection.aggregate(pipeline))
-    if result:
-        return result[0]
-    else:
-        return {"totalTypes": 0, "totalDistricts": 0}
 
+    async def compute():
+        with pymongo.timeout(MONGO_SUMMARY_TIMEOUT_S):
+            cursor = await mongo_collection.aggregate(MONGO_SUMMARY_PIPELINE)
+            result = await cursor.to_list()
+        if result:
+            return result[0]
+        else:
+            return {"totalTypes": 0, "totalDistricts": 0}
+
+    return await response_cache.get(("mongo_summary",), compute)
+
+
+# -------------------------------------------------
+# Rollups : cellules pré-agrégées (data/build_rollups.py)
+# -------------------------------------------------
+@app.get("/api/rollups/{grain}")
+async def rollups(
+    grain: Literal["daily", "hourly"],
+    group_by: str = Query("day", description="dimensions séparées par des virgules"),
+    district: Optional[str] = Query(None),
+    primary_type: Optional[str] = Query(None),
+    date_from: Optional[str] = Query(None),
+    date_to: Optional[str] = Query(None),
+):
+    """Compteurs resommés depuis crime_rollup_daily / crime_rollup_hourly."""
+    coll_name, allowed = ROLLUP_COLLECTIONS[grain]
+    dims = parse_fields(group_by) or ["day"]
+    unknown = [d for d in dims if d not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown group_by {unknown}, expected {allowed}")
+    try:
+        match = rollup_match(date_from, date_to, district, primary_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # stale : rollups en retard sur la génération courante (voir /api/timeseries)
+    stale = not generation.rollups_current()
+
+    async def compute():
+        coll = mongo_client[MONGO_DB][coll_name]
+        cursor = await coll.aggregate(rollup_pipeline(dims, match))
+        return {"grain": grain, "group_by": dims, "stale": stale, "rows": await cursor.to_list()}
+
+    # entrée bornée par l'LRU de response_cache (clé issue des filtres de l'utilisateur)
+    key = ("rollups", grain, tuple(dims), stale, json.dumps(match, sort_keys=True))
+    return await response_cache.get(key, compute)
+
+
+# -------------------------------------------------
+# Géo : tuiles et heatmap, mêmes filtres que /api/search
+# -------------------------------------------------
+async def geo_response(key, index, body, cells):
+    """Réponse JSON compacte, servie depuis le cache de tuiles si possible."""
+    meta = dict(key[2])
+
+    async def compute():
+        res = await es.search(index=index, body=body)
+        return json_bytes({**meta, "cells": cells(res["aggregations"])})
+
+    data, hit = await tile_cache.get(key, compute)
+    return FastJSONResponse(data, headers={"X-Tile-Cache": "hit" if hit else "miss"})
+
+
+@app.get("/api/geo/tiles/{z}/{x}/{y}")
+async def geo_tile(
+    z: int, x: int, y: int,
+    q: Optional[str] = Query(None),
+    primary_type: Optional[str] = Query(None),
+    district: Optional[str] = Query(None),
+    date_from: Optional[str] = Query(None),
+    date_to: Optional[str] = Query(None),
+    index: str = ES_INDEX,
+):
+    """Cellules [x, y, n] de la tuile z/x/y, à la précision z + TILE_DETAIL."""
+    await require_index(index)
+    params = search_params(q, primary_type, district, date_from, date_to)
+    try:
+        precision, body = tile_body(build_query(params), z, x, y)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    key = ("tile", index, (("z", z), ("x", x), ("y", y), ("precision", precision)),
+           tuple(sorted(params.items())))
+    return await geo_response(key, index, body, tile_cells)
+
+
+@app.get("/api/geo/heatmap")
+async def geo_heatmap(
+    bbox: str = Query(..., description="min_lon,min_lat,max_lon,max_lat"),
+    precision: int = Query(7, ge=1, le=12, description="précision geohash"),
+    q: Optional[str] = Query(None),
+    primary_type: Optional[str] = Query(None),
+    district: Optional[str] = Query(None),
+    date_from: Optional[str] = Query(None),
+    date_to: Optional[str] = Query(None),
+    index: str = ES_INDEX,
+):
+    """Cellules [lat, lon, n] (centre geohash) du rectangle demandé."""
+    await require_index(index)
+    params = search_params(q, primary_type, district, date_from, date_to)
+    try:
+        box = parse_bbox(bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    body = heatmap_body(build_query(params), box, precision)
+    key = ("heatmap", index, (("bbox", box), ("precision", precision)),
+           tuple(sorted(params.items())))
+    return await geo_response(key, index, body, heatmap_cells)
+
+
+# -------------------------------------------------
+# Séries temporelles : rollups Mongo si possible, sinon date_histogram ES
+# -------------------------------------------------
+@app.get("/api/timeseries")
+async def timeseries(
+    interval: Literal[INTERVALS] = Query("month"),
+    split_by: Optional[Literal[SPLIT_FIELDS]] = Query(None),
+    top: int = Query(10, ge=1, le=50, description="nombre de séries gardées"),
+    source: Literal["auto", "rollups", "es"] = Query("auto"),
+    q: Optional[str] = Query(None),
+    primary_type: Optional[str] = Query(None),
+    district: Optional[str] = Query(None),
+    date_from: Optional[str] = Query(None),
+    date_to: Optional[str] = Query(None),
+    index: str = ES_INDEX,
+):
+    """Axe des intervalles non vides + séries creuses [[indice, nombre], ...]."""
+    params = search_params(q, primary_type, district, date_from, date_to)
+    eligible = can_use_rollups(params, split_by)
+    if source == "rollups" and not eligible:
+        raise HTTPException(status_code=400,
+                            detail="Rollups cannot answer q or split_by=risk_level")
+
+    try:
+        # district et type déjà normalisés par search_params ; dates remises en YYYY-MM-DD
+        match = rollup_match(date_from, date_to, params.get("district"), params.get("primary_type"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def from_rollups():
+        coll = mongo_client[MONGO_DB][rollup_collection(interval)]
+        cursor = await coll.aggregate(rollup_timeseries_pipeline(interval, split_by, match))
+        return rollup_points(await cursor.to_list(), split_by)
+
+    async def from_es():
+        await require_index(index)
+        res = await es.search(index=index, body=es_timeseries_body(params, interval, split_by, top))
+        return es_points(res["aggregations"])
+
+    # rollups en retard sur la génération courante (import sans --rollups, ou en
+    # cours de rafraîchissement) : ES en mode auto, réponse marquée stale sinon
+    fresh = generation.rollups_current()
+
+    async def compute():
+        used, stale = "es", False
+        if source == "rollups" or (source == "auto" and eligible and fresh):
+            points, used, stale = await from_rollups(), "rollups", not fresh
+            # rien sur la période (rollups vides) : repli sur ES en mode auto
+            if not points and source == "auto":
+                points, used = await from_es(), "es"
+        else:
+            points = await from_es()
+        return {"interval": interval, "split_by": split_by, "source": used, "stale": stale,
+                **compress(points, split_by, top)}
+
+    if "q" in params:
+        return await compute()   # texte libre : clés trop variées pour le cache
+    key = ("timeseries", interval, split_by, top, source, index, fresh,
+           tuple(sorted(params.items())))
+    return await response_cache.get(key, compute)
@@ -0,0 +1,56 @@
+# mongo_client.py
+"""
+Clients MongoDB de l'API et des benchmarks.
+- pool : entre MONGO_MIN_POOL_SIZE (connexions gardées chaudes) et
+  MONGO_MAX_POOL_SIZE connexions ; une connexion inutilisée est fermée après
+  MONGO_MAX_IDLE_MS (keep-alive),
+- délais : connexion, sélection du serveur et opération complète
+  (timeoutMS) bornés ; une attente de connexion libre compte dans timeoutMS
+  (/api/mongo_summary, qui parcourt toute la collection, a son propre délai),
+- reprises : lectures et écritures réessayées une fois par le pilote après
+  une erreur réseau ou un changement de primaire,
+- MONGO_POOL : écouteur du pool (connexions ouvertes / empruntées), lu par
+  /health/deep.
+"""
+from pymongo import MongoClient, AsyncMongoClient
+import os
+from dotenv import load_dotenv
+
+from pool_monitor import MongoPoolMonitor
+
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+MONGO_DB = os.getenv("MONGO_DB", "city_safety")
+MONGO_COLL = os.getenv("MONGO_COLL", "crime")
+# connexions simultanées vers MongoDB par client
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "10"))
+MONGO_MAX_IDLE_MS = int(os.getenv("MONGO_MAX_IDLE_MS", "300000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "10000"))
+
+MONGO_POOL = MongoPoolMonitor(MONGO_MAX_POOL_SIZE)
+
+
+def _client_options():
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "timeoutMS": MONGO_TIMEOUT_MS,
+        "retryReads": True,
+        "retryWrites": True,
+    }
+
+
+def get_mongo_client():
+    return MongoClient(MONGO_URI, **_client_options())
+
+
+def get_async_mongo_client():
+    """Client asynchrone (pymongo async), à créer dans la boucle d'événements de l'API."""
+    return AsyncMongoClient(MONGO_URI, event_listeners=[MONGO_POOL], **_client_options())
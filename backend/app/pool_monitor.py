@@ -0,0 +1,141 @@
+# pool_monitor.py
+"""
+Compteurs des pools de connexions, lus par /health/deep :
+- BackendStats : requêtes en cours / total / erreurs / latence vers un
+  backend, connexions ouvertes vs réutilisées (le churn sous charge),
+- MongoPoolMonitor : écouteur d'événements du pool pymongo (connexions
+  ouvertes, empruntées, fermées, attentes échouées),
+- InFlightMiddleware : requêtes HTTP en cours dans l'API.
+Tout est mis à jour dans la boucle d'événements : pas de verrou.
+"""
+from pymongo import monitoring
+
+
+class BackendStats:
+    def __init__(self, max_connections):
+        self.max_connections = max_connections
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.connections_created = 0
+        self.connections_reused = 0
+
+    def start(self):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def done(self, ms, error=False):
+        self.in_flight -= 1
+        self.requests += 1
+        self.total_ms += ms
+        if error:
+            self.errors += 1
+
+    def snapshot(self):
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "max_connections": self.max_connections,
+            "utilization": round(self.in_flight / self.max_connections, 3) if self.max_connections else None,
+            "requests": self.requests,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.requests, 2) if self.requests else None,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+        }
+
+
+class MongoPoolMonitor(monitoring.ConnectionPoolListener):
+    """Compteurs agrégés sur tous les serveurs du client."""
+
+    def __init__(self, max_pool_size):
+        self.max_pool_size = max_pool_size
+        self.open = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.created = 0
+        self.closed = 0
+        self.checkout_failures = 0
+        self.cleared = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.created += 1
+        self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.closed += 1
+        self.open -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+        self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+    def snapshot(self):
+        return {
+            "in_flight": self.checked_out,
+            "max_in_flight": self.max_checked_out,
+            "max_connections": self.max_pool_size,
+            "utilization": round(self.checked_out / self.max_pool_size, 3) if self.max_pool_size else None,
+            "open_connections": self.open,
+            "connections_created": self.created,
+            "connections_closed": self.closed,
+            "checkout_failures": self.checkout_failures,
+            "pool_cleared": self.cleared,
+        }
+
+
+class RequestCounter:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+
+    def snapshot(self):
+        return {"in_flight": self.in_flight, "max_in_flight": self.max_in_flight,
+                "requests": self.requests}
+
+
+class InFlightMiddleware:
+    """Middleware ASGI minimal : compte les requêtes HTTP en cours dans `counter`."""
+
+    def __init__(self, app, counter):
+        self.app = app
+        self.counter = counter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        c = self.counter
+        c.in_flight += 1
+        c.max_in_flight = max(c.max_in_flight, c.in_flight)
+        c.requests += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            c.in_flight -= 1
@@ -0,0 +1,167 @@
+# query_builder.py
+"""
+Construction des requêtes ES de recherche (search, export, curseur).
+- seul le texte libre (q) est en contexte query et participe au score ; les
+  filtres exacts (type, district, dates) sont en contexte filter : pas de
+  score, et ES les garde dans son cache de requêtes par nœud,
+- les paramètres sont normalisés (espaces, casse, dates) et le corps est
+  produit dans un ordre fixe : deux recherches identiques donnent le même
+  corps,
+- projection _source (fields) et plafond de track_total_hits,
+- facettes (facets=) : les filtres sur un champ à facette passent en
+  post_filter, et chaque facette compte sous tous les filtres sauf le sien ;
+  résultats et compteurs des listes déroulantes viennent d'une seule requête.
+"""
+import os
+from datetime import datetime
+
+TEXT_FIELDS = ["primary_type^3", "description", "location_description"]
+# au-delà, le total est renvoyé comme borne inférieure ("gte")
+SEARCH_TOTAL_CAP = int(os.getenv("SEARCH_TOTAL_CAP", "10000"))
+# facette -> (champ, nombre de valeurs, ordre)
+FACETS = {
+    "primary_type": ("primary_type", 50, {"_count": "desc"}),
+    "district": ("district", 50, {"_key": "asc"}),
+    "period_of_day": ("period_of_day", 10, {"_count": "desc"}),
+    "risk_level": ("risk_level", 10, {"_count": "desc"}),
+    "year": ("year", 50, {"_key": "asc"}),
+}
+# paramètres de recherche qui sont aussi des facettes
+FACET_FILTERS = ("primary_type", "district")
+
+
+def parse_date(d, start=True):
+    if not d:
+        return None
+    try:
+        dt = datetime.strptime(d, "%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"Invalid date {d!r}, expected YYYY-MM-DD")
+    if start:
+        return dt.isoformat() + "Z"  # UTC début de journée
+    else:
+        dt = dt.replace(hour=23, minute=59, second=59)
+        return dt.isoformat() + "Z"  # UTC fin de journée
+
+
+def normalize_params(q=None, primary_type=None, district=None, date_from=None, date_to=None):
+    """Paramètres de recherche canoniques ; les valeurs vides ou invalides sont retirées."""
+    params = {}
+    if q:
+        q_clean = " ".join(q.split())
+        if q_clean:
+            params["q"] = q_clean
+    if primary_type:
+        # clean_crimes.py stocke les types en minuscules
+        pt_clean = primary_type.strip().lower()
+        if pt_clean:
+            params["primary_type"] = pt_clean
+    if district:
+        try:
+            params["district"] = int(str(district).strip())
+        except ValueError:
+            pass   # district non numérique : ignoré, comme avant
+    if date_from:
+        params["date_from"] = parse_date(date_from.strip(), start=True)
+    if date_to:
+        params["date_to"] = parse_date(date_to.strip(), start=False)
+    return params
+
+
+def filter_clauses(params):
+    """Filtres exacts, par paramètre (ordre fixe)."""
+    clauses = {}
+    if "primary_type" in params:
+        clauses["primary_type"] = {"term": {"primary_type": params["primary_type"]}}
+    if "district" in params:
+        clauses["district"] = {"term": {"district": params["district"]}}
+    if "date_from" in params or "date_to" in params:
+        range_q = {}
+        if "date_from" in params:
+            range_q["gte"] = params["date_from"]
+        if "date_to" in params:
+            range_q["lte"] = params["date_to"]
+        clauses["date"] = {"range": {"date": range_q}}
+    return clauses
+
+
+def build_query(params, exclude=()):
+    """Requête bool ; les filtres de `exclude` sont laissés au post_filter."""
+    must = []
+    if "q" in params:
+        must.append({"multi_match": {"query": params["q"], "fields": TEXT_FIELDS}})
+    filters = [c for name, c in filter_clauses(params).items() if name not in exclude]
+
+    if not must and not filters:
+        return {"match_all": {}}
+    bool_q = {}
+    if must:
+        bool_q["must"] = must
+    if filters:
+        bool_q["filter"] = filters
+    return {"bool": bool_q}
+
+
+def parse_fields(fields):
+    """Liste de champs "a, b,a" -> ["a", "b"] (ordre conservé, doublons retirés)."""
+    if not fields:
+        return None
+    names = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    return names or None
+
+
+def source_includes(names):
+    """Champs _source à demander à ES pour produire `names`."""
+    needed = set(names)
+    needed.discard("id")   # l'id vient de _id
+    return sorted(needed)
+
+
+def parse_facets(facets):
+    """"primary_type,district" -> liste validée ; lève ValueError sur une facette inconnue."""
+    names = parse_fields(facets)
+    if not names:
+        return None
+    unknown = [n for n in names if n not in FACETS]
+    if unknown:
+        raise ValueError(f"Unknown facets {unknown}, expected {list(FACETS)}")
+    return names
+
+
+def facet_aggs(params, facets):
+    """Agrégation par facette, filtrée par les sélections des autres facettes."""
+    selected = {k: c for k, c in filter_clauses(params).items() if k in FACET_FILTERS}
+    aggs = {}
+    for name in facets:
+        field, size, order = FACETS[name]
+        others = [c for k, c in selected.items() if k != name]
+        aggs[name] = {
+            "filter": {"bool": {"filter": others}} if others else {"match_all": {}},
+            "aggs": {"values": {"terms": {"field": field, "size": size, "order": order}}},
+        }
+    return aggs
+
+
+def facet_counts(aggs, facets):
+    """Agrégations -> {facette: [{"key", "count"}, ...]}."""
+    return {name: [{"key": b["key"], "count": b["doc_count"]}
+                   for b in aggs[name]["values"]["buckets"]]
+            for name in facets}
+
+
+def search_body(params, size=20, offset=0, fields=None, total_cap=SEARCH_TOTAL_CAP, facets=None):
+    if facets:
+        body = {"query": build_query(params, exclude=FACET_FILTERS), "size": size}
+        post = [c for k, c in filter_clauses(params).items() if k in FACET_FILTERS]
+        if post:
+            body["post_filter"] = {"bool": {"filter": post}}
+        body["aggs"] = facet_aggs(params, facets)
+    else:
+        body = {"query": build_query(params), "size": size}
+    if offset:
+        body["from"] = offset
+    if fields:
+        body["_source"] = source_includes(fields)
+    if total_cap is not None:
+        body["track_total_hits"] = total_cap or False   # 0 : pas de comptage
+    return body
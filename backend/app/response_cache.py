@@ -0,0 +1,159 @@
+# response_cache.py
+"""
+Cache des réponses agrégées, versionné par la génération du jeu de données.
+- la génération (collection dataset_meta, incrémentée par load_to_mongo.py,
+  index_to_es.py et ingest.py à la fin d'un import) est relue toutes les
+  GENERATION_POLL_S secondes en tâche de fond : aucun appel Mongo sur le
+  chemin des requêtes,
+- une entrée est fraîche tant que sa génération est la courante et qu'elle a
+  moins de CACHE_TTL secondes (filet de sécurité si un import n'a pas
+  incrémenté la génération),
+- une entrée de la génération courante dont le TTL est dépassé depuis moins
+  de CACHE_MAX_STALE secondes est servie immédiatement pendant qu'une seule
+  tâche la recalcule (stale-while-revalidate) ; les entrées des générations
+  précédentes sont purgées au premier accès qui voit la nouvelle,
+- LRU borné à CACHE_MAX_ENTRIES entrées : les clés construites depuis les
+  paramètres des requêtes ne font pas grossir la mémoire sans limite,
+- les calculs simultanés d'une même clé sont regroupés en un seul.
+"""
+import os
+import time
+import asyncio
+from collections import OrderedDict
+
+GENERATION_COLL = "dataset_meta"
+GENERATION_POLL_S = float(os.getenv("GENERATION_POLL_S", "5"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+CACHE_MAX_STALE = float(os.getenv("CACHE_MAX_STALE", "3600"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2000"))
+
+
+class GenerationWatcher:
+    """
+    Dernière génération connue du jeu de données (0 si jamais incrémentée),
+    et génération reflétée par les rollups (data/build_rollups.py).
+    """
+
+    def __init__(self, db, poll=GENERATION_POLL_S):
+        self.coll = db[GENERATION_COLL]
+        self.poll = poll
+        self.value = None       # None : pas encore lue, le cache ne vit que sur le TTL
+        self.rollups = None     # None : rollups jamais construits (ou pas encore lus)
+        self.task = None
+
+    async def start(self):
+        # première lecture dans la tâche : un Mongo lent ne bloque pas le démarrage
+        self.task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def _poll_loop(self):
+        while True:
+            await self.read()
+            await asyncio.sleep(self.poll)
+
+    async def read(self):
+        try:
+            cursor = self.coll.find({"_id": {"$in": ["generation", "rollups"]}})
+            docs = {d["_id"]: d for d in await cursor.to_list()}
+        except Exception as e:
+            print(f"⚠ Lecture de la génération impossible : {e!r}")
+            return   # on garde la dernière valeur connue
+        self.value = docs["generation"]["value"] if "generation" in docs else 0
+        self.rollups = docs.get("rollups", {}).get("generation")
+
+    def rollups_current(self):
+        """Vrai si les rollups reflètent la génération courante du jeu de données."""
+        return self.rollups is not None and self.rollups == self.value
+
+
+class ResponseCache:
+    def __init__(self, generation, ttl=CACHE_TTL, max_stale=CACHE_MAX_STALE,
+                 max_entries=CACHE_MAX_ENTRIES):
+        self.generation = generation
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        # clé -> (valeur, génération, instant du calcul), du moins au plus récemment lu
+        self.entries = OrderedDict()
+        self.inflight = {}      # clé -> tâche de calcul en cours
+        self.seen_generation = None
+        self.counters = {"hits": 0, "misses": 0, "stale": 0,
+                         "revalidations": 0, "errors": 0, "evictions": 0, "purged": 0}
+
+    async def get(self, key, compute):
+        """Valeur en cache pour `key`, sinon `await compute()`."""
+        if self.generation.value != self.seen_generation:
+            self._purge(self.generation.value)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            value, gen, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl:
+                self.counters["hits"] += 1
+                return value
+            if age < self.max_stale:
+                self.counters["stale"] += 1
+                self._revalidate(key, compute)
+                return value
+        self.counters["misses"] += 1
+        # shield : une requête annulée n'annule pas le calcul partagé
+        return await asyncio.shield(self._compute(key, compute))
+
+    def _compute(self, key, compute):
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run(key, compute))
+            self.inflight[key] = task
+        return task
+
+    async def _run(self, key, compute):
+        gen = self.generation.value   # lue avant le calcul : un import concurrent le périmera
+        try:
+            value = await compute()
+            if gen == self.generation.value:   # sinon déjà périmé : pas stocké
+                self._store(key, (value, gen, time.monotonic()))
+            return value
+        except Exception:
+            self.counters["errors"] += 1
+            raise
+        finally:
+            self.inflight.pop(key, None)
+
+    def _store(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def _purge(self, gen):
+        stale = [k for k, (_, g, _) in self.entries.items() if g != gen]
+        for k in stale:
+            del self.entries[k]
+        self.counters["purged"] += len(stale)
+        self.seen_generation = gen
+
+    def _revalidate(self, key, compute):
+        if key in self.inflight:
+            return
+        self.counters["revalidations"] += 1
+        task = self._compute(key, compute)
+        # l'erreur est comptée dans _run ; l'entrée périmée reste servie
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    def stats(self):
+        c = dict(self.counters)
+        served = c["hits"] + c["stale"] + c["misses"]
+        c["hit_ratio"] = round((c["hits"] + c["stale"]) / served, 3) if served else None
+        c["entries"] = len(self.entries)
+        c["max_entries"] = self.max_entries
+        c["generation"] = self.generation.value
+        return c
@@ -0,0 +1,40 @@
+# responses.py
+"""
+Sérialisation des réponses JSON.
+- FastJSONResponse : classe de réponse par défaut de l'API, rendue par
+  orjson (plusieurs fois plus rapide que json.dumps sur les pages de hits) ;
+  des octets déjà rendus (caches de tuiles et de suggestions) sont servis
+  tels quels,
+- trusted() : sur les chemins chauds dont les données viennent telles quelles
+  d'ES, la réponse est rendue directement, sans validation pydantic ni
+  jsonable_encoder. Les modèles de réponse (schemas.py) restent déclarés pour
+  la documentation OpenAPI ; VALIDATE_RESPONSES=1 les réactive (dev, tests).
+Voir bench_serialization.py pour le coût par page de 20 / 100 / 1000 hits.
+"""
+import os
+
+import orjson
+from fastapi.responses import JSONResponse
+
+VALIDATE_RESPONSES = os.getenv("VALIDATE_RESPONSES", "0").lower() in ("1", "true", "yes")
+
+
+class FastJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content):
+        if isinstance(content, bytes):
+            return content   # déjà rendu par json_bytes
+        return json_bytes(content)
+
+
+def json_bytes(content):
+    # clés non-str (districts int des agrégations) acceptées comme json.dumps
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def trusted(payload):
+    """Réponse sans validation, sauf si VALIDATE_RESPONSES est activé."""
+    if VALIDATE_RESPONSES:
+        return payload   # validé et filtré par le response_model de la route
+    return FastJSONResponse(payload)
@@ -0,0 +1,63 @@
+# rollup_query.py
+"""
+Requêtes sur les collections pré-agrégées écrites par data/build_rollups.py.
+Une cellule = jour × district × type (× heure) avec ses compteurs ; les
+tableaux de bord les resomment selon les dimensions demandées.
+"""
+from query_builder import parse_date
+
+# grain -> (collection, dimensions disponibles)
+ROLLUP_COLLECTIONS = {
+    "daily": ("crime_rollup_daily", ["day", "month", "year", "district", "primary_type"]),
+    "hourly": ("crime_rollup_hourly", ["day", "month", "year", "district", "primary_type", "hour"]),
+}
+METRICS = ["count", "arrests", "domestic", "victims", "physical", "psychological",
+           "property", "severity_sum"]
+# cellules construites avant la conversion en entier : hour encore texte ("5", "5.0")
+HOUR_EXPR = {"$toInt": {"$convert": {"input": "$hour", "to": "double",
+                                     "onError": None, "onNull": None}}}
+DIMENSION_EXPR = {
+    "day": "$day",
+    "month": {"$substrCP": ["$day", 0, 7]},
+    "year": {"$substrCP": ["$day", 0, 4]},
+    "district": "$district",
+    "primary_type": "$primary_type",
+    "hour": HOUR_EXPR,
+}
+
+
+def rollup_match(date_from=None, date_to=None, district=None, primary_type=None):
+    """Filtre sur les cellules ; lève ValueError sur une date invalide."""
+    match = {}
+    day_range = {}
+    # jours comparés comme texte : forme canonique YYYY-MM-DD ("2024-1-5" -> "2024-01-05")
+    if date_from and date_from.strip():
+        day_range["$gte"] = parse_date(date_from.strip())[:10]
+    if date_to and date_to.strip():
+        day_range["$lte"] = parse_date(date_to.strip())[:10]
+    if day_range:
+        match["day"] = day_range
+    if district:
+        try:
+            match["district"] = int(district)
+        except ValueError:
+            raise ValueError(f"Invalid district {district!r}")
+    if primary_type and primary_type.strip():
+        match["primary_type"] = primary_type.strip().lower()
+    return match
+
+
+def rollup_pipeline(group_by, match):
+    group_id = {dim: DIMENSION_EXPR[dim] for dim in group_by}
+    project = {"_id": 0, **{dim: f"$_id.{dim}" for dim in group_by},
+               **{m: 1 for m in METRICS}}
+    project["arrest_ratio"] = {"$cond": [{"$gt": ["$count", 0]},
+                                         {"$divide": ["$arrests", "$count"]}, None]}
+    project["avg_severity"] = {"$cond": [{"$gt": ["$count", 0]},
+                                         {"$divide": ["$severity_sum", "$count"]}, None]}
+    return [
+        {"$match": match},
+        {"$group": {"_id": group_id, **{m: {"$sum": f"${m}"} for m in METRICS}}},
+        {"$project": project},
+        {"$sort": {dim: 1 for dim in group_by}},
+    ]
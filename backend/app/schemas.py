@@ -1,11 +1,41 @@
 # schemas.py
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Any, Literal
 
 class CrimeResult(BaseModel):
     id: str
-    source: Dict
+    source: Dict[str, Any]
+
+class CrimeHit(CrimeResult):
+    score: Optional[float] = None   # null avec un tri (curseur)
+
+class FacetBucket(BaseModel):
+    key: Any
+    count: int
 
 class SearchResponse(BaseModel):
-    total: int
-    hits: list
+    total: Optional[int] = None     # null si total_cap=0
+    total_relation: Literal["eq", "gte"] = "eq"
+    hits: List[CrimeHit]
+    next_cursor: Optional[str] = None
+    facets: Optional[Dict[str, List[FacetBucket]]] = None
+
+class CrimeBatchRequest(BaseModel):
+    ids: List[str]
+    fields: Optional[str] = None   # champs séparés par des virgules, comme /api/search
+
+class CrimeBatchItem(BaseModel):
+    id: str
+    status: Literal["found", "not_found", "error"]
+    source: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+class CrimeBatchResponse(BaseModel):
+    requested: int
+    found: int
+    results: List[CrimeBatchItem]
+
+class SummaryResponse(BaseModel):
+    by_hour: Dict[str, Any]
+    by_type: Dict[str, Any]
+    arrest_stats: Dict[str, Any]
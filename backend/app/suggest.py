@@ -0,0 +1,36 @@
+# suggest.py
+"""
+Saisie semi-automatique de la recherche de l'Explorer (/api/suggest) :
+suggester completion sur le champ `suggest` (type, description, lieu, bloc ;
+voir data/transform.py). Les réponses des préfixes chauds sont gardées dans
+un petit TileCache (LRU en octets, versionné par génération).
+"""
+import os
+
+SUGGEST_CACHE_BYTES = int(os.getenv("SUGGEST_CACHE_KB", "2048")) * 1024
+SUGGEST_MAX_PREFIX = 50
+
+
+def normalize_prefix(prefix):
+    """Espaces réduits, minuscules (l'analyseur du champ completion ignore la casse)."""
+    return " ".join(prefix.split()).lower()[:SUGGEST_MAX_PREFIX]
+
+
+def suggest_body(prefix, size):
+    return {
+        "_source": False,
+        "suggest": {"crime": {
+            "prefix": prefix,
+            "completion": {"field": "suggest", "size": size, "skip_duplicates": True},
+        }},
+    }
+
+
+def suggestion_texts(res):
+    """Textes proposés, dans l'ordre du suggester, sans doublons de casse."""
+    entries = res.get("suggest", {}).get("crime", [])
+    seen = {}
+    for entry in entries:
+        for opt in entry.get("options", []):
+            seen.setdefault(opt["text"].lower(), opt["text"])
+    return list(seen.values())
@@ -0,0 +1,92 @@
+# tile_cache.py
+"""
+Cache LRU des réponses géographiques (tuiles, heatmaps) et des suggestions,
+borné en octets.
+- les valeurs sont les réponses JSON déjà sérialisées : la taille comptée est
+  exactement celle servie, et une tuile en cache n'est pas resérialisée,
+- la clé inclut la génération du jeu de données (voir response_cache.py) :
+  après un import, les anciennes tuiles ne sont plus jamais lues et sortent
+  par la queue de l'LRU ; elles sont purgées d'un coup au premier accès
+  qui voit la nouvelle génération,
+- les calculs simultanés d'une même tuile sont regroupés en un seul.
+"""
+import os
+import asyncio
+from collections import OrderedDict
+
+TILE_CACHE_BYTES = int(os.getenv("TILE_CACHE_MB", "64")) * 1024 * 1024
+
+
+class TileCache:
+    def __init__(self, generation, max_bytes=TILE_CACHE_BYTES):
+        self.generation = generation
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()    # (génération, clé) -> octets, du plus ancien au plus récent
+        self.bytes = 0
+        self.inflight = {}
+        self.seen_generation = None
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "purged": 0,
+                         "too_large": 0, "errors": 0}
+
+    async def get(self, key, compute):
+        """(octets, True si servi depuis le cache) ; `compute` retourne des octets."""
+        gen = self.generation.value
+        if gen != self.seen_generation:
+            self._purge(gen)
+        full_key = (gen, key)
+        data = self.entries.get(full_key)
+        if data is not None:
+            self.entries.move_to_end(full_key)
+            self.counters["hits"] += 1
+            return data, True
+        self.counters["misses"] += 1
+        task = self.inflight.get(full_key)
+        if task is None:
+            task = asyncio.create_task(self._run(full_key, compute))
+            self.inflight[full_key] = task
+        # shield : une requête annulée (carte déplacée) n'annule pas le calcul partagé
+        return await asyncio.shield(task), False
+
+    async def _run(self, full_key, compute):
+        try:
+            data = await compute()
+        except Exception:
+            self.counters["errors"] += 1
+            raise
+        finally:
+            self.inflight.pop(full_key, None)
+        self._store(full_key, data)
+        return data
+
+    def _store(self, full_key, data):
+        if full_key[0] != self.generation.value:
+            return   # import terminé pendant le calcul : résultat déjà périmé
+        if len(data) > self.max_bytes:
+            self.counters["too_large"] += 1
+            return
+        old = self.entries.pop(full_key, None)
+        if old is not None:
+            self.bytes -= len(old)
+        self.entries[full_key] = data
+        self.bytes += len(data)
+        while self.bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= len(evicted)
+            self.counters["evictions"] += 1
+
+    def _purge(self, gen):
+        stale = [k for k in self.entries if k[0] != gen]
+        for k in stale:
+            self.bytes -= len(self.entries.pop(k))
+        self.counters["purged"] += len(stale)
+        self.seen_generation = gen
+
+    def stats(self):
+        c = dict(self.counters)
+        served = c["hits"] + c["misses"]
+        c["hit_ratio"] = round(c["hits"] / served, 3) if served else None
+        c["entries"] = len(self.entries)
+        c["bytes"] = self.bytes
+        c["max_bytes"] = self.max_bytes
+        c["generation"] = self.seen_generation
+        return c
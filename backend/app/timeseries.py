@@ -0,0 +1,119 @@
+# timeseries.py
+"""
+Séries temporelles (nombre de crimes par intervalle), avec découpage
+optionnel par type, district ou niveau de risque.
+Deux sources donnant les mêmes clés de temps :
+- les rollups Mongo (data/build_rollups.py) : quelques milliers de cellules
+  même sur plusieurs années, utilisés dès que la requête le permet
+  (pas de texte libre, découpage par type ou district),
+- sinon un date_histogram ES, filtres en contexte filter.
+Les séries sont creuses : un axe commun des intervalles non vides, puis
+pour chaque série des paires [indice sur l'axe, nombre], zéros omis.
+"""
+from query_builder import build_query
+from rollup_query import HOUR_EXPR
+
+INTERVALS = ("hour", "day", "week", "month")
+SPLIT_FIELDS = ("primary_type", "district", "risk_level")
+ROLLUP_SPLITS = ("primary_type", "district")
+# format des clés, identique pour les deux sources
+ES_KEY_FORMAT = {"hour": "yyyy-MM-dd'T'HH:00", "day": "yyyy-MM-dd",
+                 "week": "yyyy-MM-dd", "month": "yyyy-MM-dd"}
+
+
+def two_digits(expr):
+    return {"$cond": [{"$lt": [expr, 10]},
+                      {"$concat": ["0", {"$toString": expr}]},
+                      {"$toString": expr}]}
+
+
+# clé d'intervalle depuis une cellule de rollup (jour "YYYY-MM-DD", heure entière
+# avant le remplissage : "T05:00" comme le format ES)
+ROLLUP_KEY_EXPR = {
+    "hour": {"$concat": ["$day", "T", two_digits(HOUR_EXPR), ":00"]},
+    "day": "$day",
+    "week": {"$dateToString": {"format": "%Y-%m-%d", "date": {"$dateTrunc": {
+        "date": {"$dateFromString": {"dateString": "$day"}},
+        "unit": "week", "startOfWeek": "monday"}}}},
+    "month": {"$concat": [{"$substrCP": ["$day", 0, 7]}, "-01"]},
+}
+
+
+def can_use_rollups(params, split_by):
+    return "q" not in params and split_by in (None,) + ROLLUP_SPLITS
+
+
+def rollup_collection(interval):
+    return "crime_rollup_hourly" if interval == "hour" else "crime_rollup_daily"
+
+
+def rollup_timeseries_pipeline(interval, split_by, match):
+    group_id = {"t": ROLLUP_KEY_EXPR[interval]}
+    if split_by:
+        group_id["s"] = f"${split_by}"
+    return [
+        {"$match": match},
+        {"$group": {"_id": group_id, "n": {"$sum": "$count"}}},
+        {"$match": {"n": {"$gt": 0}}},
+    ]
+
+
+def rollup_points(rows, split_by):
+    """Lignes {_id: {t, s}, n} -> [(clé de temps, valeur de découpage, n)]."""
+    if not split_by:
+        return [(r["_id"]["t"], None, r["n"]) for r in rows]
+    # cellule sans district / type : série "unknown", pas le total
+    return [(r["_id"]["t"], r["_id"].get("s") if r["_id"].get("s") is not None else "unknown", r["n"])
+            for r in rows]
+
+
+def es_timeseries_body(params, interval, split_by, top):
+    histogram = {"date_histogram": {"field": "date", "calendar_interval": interval,
+                                    "format": ES_KEY_FORMAT[interval], "min_doc_count": 1}}
+    aggs = {"timeline": histogram}
+    if split_by:
+        aggs["split"] = {"terms": {"field": split_by, "size": top},
+                         "aggs": {"timeline": histogram}}
+    return {"size": 0, "track_total_hits": False, "query": build_query(params), "aggs": aggs}
+
+
+def es_points(aggs):
+    """Agrégations ES -> [(clé de temps, valeur de découpage, n)] (None : total)."""
+    points = [(b["key_as_string"], None, b["doc_count"])
+              for b in aggs["timeline"]["buckets"]]
+    for split in aggs.get("split", {}).get("buckets", []):
+        points.extend((b["key_as_string"], split["key"], b["doc_count"])
+                      for b in split["timeline"]["buckets"])
+    return points
+
+
+def compress(points, split_by, top):
+    """
+    Points -> {"axis", "total", "series"} creux. Pour les rollups le total est
+    recalculé depuis les séries ; seules les `top` plus grosses sont gardées.
+    """
+    totals = {}
+    by_split = {}
+    has_total = any(s is None for _, s, _ in points)
+    for t, s, n in points:
+        if t is None:
+            continue   # date ou heure absente
+        if s is None:
+            totals[t] = totals.get(t, 0) + n
+            continue
+        series = by_split.setdefault(s, {})
+        series[t] = series.get(t, 0) + n
+        if not has_total:
+            totals[t] = totals.get(t, 0) + n
+
+    axis = sorted(totals)
+    index = {t: i for i, t in enumerate(axis)}
+    result = {"axis": axis, "total": [[index[t], totals[t]] for t in axis]}
+    if split_by:
+        ranked = sorted(by_split.items(), key=lambda kv: (-sum(kv[1].values()), str(kv[0])))
+        result["series"] = [
+            {"key": key, "count": sum(values.values()),
+             "points": [[index[t], values[t]] for t in sorted(values) if t in index]}
+            for key, values in ranked[:top]
+        ]
+    return result
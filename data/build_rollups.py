@@ -0,0 +1,209 @@
+# build_rollups.py
+"""
+Collections pré-agrégées (rollups) pour les tableaux de bord, écrites par
+$merge depuis la collection des crimes :
+- crime_rollup_daily  : jour × district × type,
+- crime_rollup_hourly : jour × district × type × heure,
+avec par cellule : nombre de crimes, arrestations, violences domestiques,
+victimes (total et par type) et somme des gravités.
+Rafraîchissement incrémental : seuls les jours touchés depuis le dernier
+passage (updated_at posé par load_to_mongo.py / ingest.py) sont recalculés ;
+les cellules de ces jours qui n'existent plus sont supprimées.
+La génération du jeu de données reflétée par les rollups est notée dans
+dataset_meta ({_id: "rollups", generation}) : l'API ne les utilise que si
+elle est égale à la génération courante. Les chargeurs incrémentent donc la
+génération AVANT de rafraîchir les rollups.
+"""
+# python build_rollups.py --coll crimes
+# python build_rollups.py --coll crimes --full
+# python build_rollups.py --coll crimes --days 2024-03-01 2024-03-02
+
+
+import argparse
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from pymongo import MongoClient, ASCENDING
+
+# nom -> dimensions du regroupement (toujours préfixées par le jour)
+ROLLUPS = {
+    "crime_rollup_daily": ["district", "primary_type"],
+    "crime_rollup_hourly": ["district", "primary_type", "hour"],
+}
+STATE_COLL = "dataset_meta"
+TRUE_VALUES = [True, "true", "True", "TRUE", "Y", "y", 1, "1"]
+
+
+def connect_mongo(uri, db_name):
+    client = MongoClient(uri)
+    return client[db_name]
+
+
+# -------------------------------------------------
+# Expressions d'agrégation
+# -------------------------------------------------
+# jour "YYYY-MM-DD" depuis la date ISO (texte) ou un Date BSON
+DAY_EXPR = {"$cond": [
+    {"$eq": [{"$type": "$date"}, "date"]},
+    {"$dateToString": {"format": "%Y-%m-%d", "date": "$date"}},
+    {"$substrCP": ["$date", 0, 10]},
+]}
+# hour peut être texte ("5", "5.0") dans les imports plus anciens : entier dans tous les cas,
+# sinon les cellules horaires se trient "10" avant "2"
+HOUR_EXPR = {"$toInt": {"$convert": {
+    "input": {"$ifNull": ["$hour", {"$substrCP": ["$date", 11, 2]}]},
+    "to": "double", "onError": None, "onNull": None}}}
+DIMENSION_EXPR = {"district": "$district", "primary_type": "$primary_type", "hour": HOUR_EXPR}
+
+METRICS = {
+    "count": {"$sum": 1},
+    "arrests": {"$sum": {"$cond": [{"$in": ["$Arrest", TRUE_VALUES]}, 1, 0]}},
+    "domestic": {"$sum": {"$cond": [{"$in": ["$Domestic", TRUE_VALUES]}, 1, 0]}},
+    "victims": {"$sum": {"$ifNull": ["$victims_count", 0]}},
+    "physical": {"$sum": {"$ifNull": ["$victim_type_breakdown.physical", 0]}},
+    "psychological": {"$sum": {"$ifNull": ["$victim_type_breakdown.psychological", 0]}},
+    "property": {"$sum": {"$ifNull": ["$victim_type_breakdown.property", 0]}},
+    "severity_sum": {"$sum": {"$ifNull": ["$severity", 0]}},
+}
+
+
+def day_ranges(days):
+    """Jours -> intervalles [début, fin) de jours consécutifs."""
+    ranges = []
+    for d in sorted(days):
+        if ranges and ranges[-1][1] == d:
+            ranges[-1][1] = d + timedelta(days=1)
+        else:
+            ranges.append([d, d + timedelta(days=1)])
+    return ranges
+
+
+def days_match(days):
+    """Filtre sur `date` (index date) couvrant exactement ces jours."""
+    if days is None:
+        return {"date": {"$ne": None}}
+    return {"$or": [
+        {"date": {"$gte": start.isoformat(), "$lt": end.isoformat()}}
+        for start, end in day_ranges(days)
+    ]}
+
+
+def rollup_pipeline(name, dims, match, built_at):
+    group_id = {"day": DAY_EXPR, **{d: DIMENSION_EXPR[d] for d in dims}}
+    project = {"_id": 1, "day": "$_id.day", **{d: f"$_id.{d}" for d in dims},
+               **{m: 1 for m in METRICS}, "built_at": {"$literal": built_at}}
+    return [
+        {"$match": match},
+        {"$group": {"_id": group_id, **METRICS}},
+        {"$project": project},
+        {"$merge": {"into": name, "on": "_id",
+                    "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+
+# -------------------------------------------------
+# Construction
+# -------------------------------------------------
+def touched_days(coll, since):
+    """Jours des documents écrits depuis `since` (index updated_at_id)."""
+    pipeline = [
+        {"$match": {"updated_at": {"$gt": since}}},
+        {"$group": {"_id": DAY_EXPR}},
+    ]
+    days = set()
+    for doc in coll.aggregate(pipeline, allowDiskUse=True):
+        try:
+            days.add(date.fromisoformat(doc["_id"]))
+        except (TypeError, ValueError):
+            pass   # date absente ou illisible : pas de cellule
+    return days
+
+
+def ensure_rollup_indexes(db):
+    for name, dims in ROLLUPS.items():
+        db[name].create_index([("day", ASCENDING)], name="day")
+        for dim in ("district", "primary_type"):
+            db[name].create_index([(dim, ASCENDING), ("day", ASCENDING)], name=f"{dim}_day")
+
+
+def build_rollups(db, coll_name, days=None):
+    """
+    Recalcule les rollups pour `days` (ensemble de date), ou pour tout
+    l'historique si days est None. Retourne le nombre de cellules par rollup.
+    """
+    coll = db[coll_name]
+    built_at = datetime.now(timezone.utc)
+    match = days_match(days)
+    ensure_rollup_indexes(db)
+    cells = {}
+    for name, dims in ROLLUPS.items():
+        start = time.perf_counter()
+        coll.aggregate(rollup_pipeline(name, dims, match, built_at), allowDiskUse=True)
+        # cellules des jours recalculés qui n'ont pas été réécrites : plus de crimes
+        scope = {} if days is None else {"day": {"$in": sorted(d.isoformat() for d in days)}}
+        removed = db[name].delete_many({**scope, "built_at": {"$ne": built_at}}).deleted_count
+        cells[name] = db[name].count_documents(scope)
+        print(f"  {name:<22} {cells[name]:>8} cellules, {removed} supprimées, "
+              f"{time.perf_counter() - start:.2f} s")
+    return cells
+
+
+def mark_rollups(db, coll_name, generation):
+    """Note la génération reflétée par les rollups (lue par l'API, voir timeseries)."""
+    db[STATE_COLL].update_one(
+        {"_id": "rollups"},
+        {"$set": {"generation": generation, "coll": coll_name,
+                  "updated_at": datetime.now(timezone.utc)}},
+        upsert=True)
+
+
+def refresh_rollups(db, coll_name, since=None, full=False, days=None):
+    """
+    Rafraîchit les rollups : jours explicites, jours touchés depuis `since`,
+    ou depuis le dernier passage enregistré dans dataset_meta.
+    """
+    state_key = f"rollups:{coll_name}"
+    state = db[STATE_COLL].find_one({"_id": state_key}) or {}
+    # bornes prises avant le calcul : une écriture concurrente sera reprise au passage suivant,
+    # et une génération incrémentée pendant le calcul laisse les rollups marqués en retard
+    mark = datetime.now(timezone.utc)
+    gen_doc = db[STATE_COLL].find_one({"_id": "generation"}) or {}
+    generation = gen_doc.get("value", 0)
+
+    if not full and days is None:
+        since = since or state.get("updated_at")
+        if since is None:
+            print("Aucun passage précédent : construction complète.")
+            full = True
+        else:
+            days = touched_days(db[coll_name], since)
+            if not days:
+                print("Rollups à jour : aucun jour touché.")
+                db[STATE_COLL].update_one({"_id": state_key}, {"$set": {"updated_at": mark}},
+                                          upsert=True)
+                mark_rollups(db, coll_name, generation)
+                return {}
+
+    label = "tout l'historique" if full else f"{len(days)} jour(s)"
+    print(f"📊 Rollups {coll_name} : {label}")
+    cells = build_rollups(db, coll_name, None if full else days)
+    db[STATE_COLL].update_one({"_id": state_key}, {"$set": {"updated_at": mark}}, upsert=True)
+    mark_rollups(db, coll_name, generation)
+    return cells
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Construire les rollups jour/district/type/heure")
+    p.add_argument("--mongo", default="mongodb://localhost:27017")
+    p.add_argument("--db", default="city_safety")
+    p.add_argument("--coll", default="crimes")
+    p.add_argument("--full", action="store_true", help="tout recalculer")
+    p.add_argument("--days", nargs="+", default=None, help="jours à recalculer (YYYY-MM-DD)")
+    args = p.parse_args()
+
+    from load_to_mongo import bump_generation   # import circulaire : load_to_mongo importe ce module
+    db = connect_mongo(args.mongo, args.db)
+    days = {date.fromisoformat(d) for d in args.days} if args.days else None
+    # génération d'abord : les caches de l'API sont invalidés et les rollups notés à jour
+    bump_generation(db, f"build_rollups:{args.coll}")
+    refresh_rollups(db, args.coll, full=args.full, days=days)
@@ -7,15 +7,38 @@ Version mise à jour :
 """
 
 # python clean_crimes.py --csv C:\path\to\Crimes.csv --out cleaned_crimes.jsonl
+# python clean_crimes.py --csv C:\path\to\Crimes.csv --out cleaned_crimes.jsonl --workers 4
+# python clean_crimes.py --csv C:\path\to\Crimes.csv --format parquet   (→ cleaned_crimes.parquet)
+# python clean_crimes.py --csv C:\path\to\Crimes.csv --bench   (compare ligne à ligne / vectorisé)
 # -------------------------------------------------------
 
 import pandas as pd
 import numpy as np
 import json
+import time
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from dateutil import parser
+from functools import partial
 from tqdm import tqdm
 import argparse
 
+try:
+    import orjson  # sérialiseur JSON rapide (optionnel)
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa  # requis seulement pour --format parquet / arrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+FORMATS = ("jsonl", "parquet", "arrow")  # le format sert aussi d'extension par défaut
+# colonnes entières (int64 dans le schéma Arrow) : entiers ou null dans tous les formats
+INT_COLUMNS = ("district", "year", "victims_count", "hour")
+
 # -------------------------------------------------------
 # 1. Parsing robuste des dates
 # -------------------------------------------------------
@@ -31,10 +54,75 @@ def parse_date_safe(value):
             return pd.NaT
 
 
+def parse_dates(values, max_passes=3):
+    """
+    Version vectorisée : pd.to_datetime sur toute la colonne (format inféré),
+    puis une nouvelle passe vectorisée sur les lignes en échec (un autre format
+    peut y dominer), et dateutil uniquement sur ce qui reste.
+    """
+    parsed = pd.to_datetime(values, utc=True, errors="coerce")
+    failed = parsed.isna() & values.notna()
+    for _ in range(max_passes - 1):
+        if not failed.any():
+            return parsed
+        retry = pd.to_datetime(values[failed], utc=True, errors="coerce")
+        if retry.notna().sum() == 0:
+            break
+        parsed[failed] = retry
+        failed = parsed.isna() & values.notna()
+    if failed.any():
+        parsed[failed] = pd.to_datetime(
+            values[failed].map(parse_date_safe), utc=True, errors="coerce"
+        )
+    return parsed
+
+
+# -------------------------------------------------------
+# Construction des objets imbriqués
+# -------------------------------------------------------
+def build_victim_breakdown(df, vectorized=True):
+    cols = ["num_physical_victims", "num_psychological_victims", "num_property_victims"]
+    if not vectorized:
+        return df.apply(
+            lambda r: {
+                "physical": int(r["num_physical_victims"]) if pd.notna(r["num_physical_victims"]) else 0,
+                "psychological": int(r["num_psychological_victims"]) if pd.notna(r["num_psychological_victims"]) else 0,
+                "property": int(r["num_property_victims"]) if pd.notna(r["num_property_victims"]) else 0,
+            },
+            axis=1
+        )
+    physical, psychological, prop = (
+        pd.to_numeric(df[c], errors="coerce").fillna(0).astype(int).tolist() for c in cols
+    )
+    return pd.Series(
+        [{"physical": a, "psychological": b, "property": c}
+         for a, b, c in zip(physical, psychological, prop)],
+        index=df.index, dtype=object
+    )
+
+
+def build_location(df, vectorized=True):
+    if not vectorized:
+        return df.apply(
+            lambda r: {"lat": r["latitude"], "lon": r["longitude"]}
+            if pd.notna(r.get("latitude")) and pd.notna(r.get("longitude"))
+            else None,
+            axis=1
+        )
+    if "latitude" not in df.columns or "longitude" not in df.columns:
+        return pd.Series(None, index=df.index, dtype=object)
+    valid = (df["latitude"].notna() & df["longitude"].notna()).tolist()
+    return pd.Series(
+        [{"lat": lat, "lon": lon} if ok else None
+         for lat, lon, ok in zip(df["latitude"].tolist(), df["longitude"].tolist(), valid)],
+        index=df.index, dtype=object
+    )
+
+
 # -------------------------------------------------------
 # 2. Nettoyage d’un chunk
 # -------------------------------------------------------
-def clean_chunk(df):
+def clean_chunk(df, vectorized=True):
 
     # Toutes les colonnes enrichies possibles
     expected_cols = df.columns.tolist()
@@ -87,7 +175,10 @@ def clean_chunk(df):
     # 3) Parsing des dates
     # -------------------------------------------------------
     if "date" in df.columns:
-        df["date"] = df["date"].apply(parse_date_safe)
+        if vectorized:
+            df["date"] = parse_dates(df["date"])
+        else:
+            df["date"] = df["date"].apply(parse_date_safe)
 
     # -------------------------------------------------------
     # 4) Convertir victm_type_breakdown en JSON
@@ -96,14 +187,7 @@ def clean_chunk(df):
         "num_psychological_victims" in df.columns and
         "num_property_victims" in df.columns):
 
-        df["victim_type_breakdown"] = df.apply(
-            lambda r: {
-                "physical": int(r["num_physical_victims"]) if pd.notna(r["num_physical_victims"]) else 0,
-                "psychological": int(r["num_psychological_victims"]) if pd.notna(r["num_psychological_victims"]) else 0,
-                "property": int(r["num_property_victims"]) if pd.notna(r["num_property_victims"]) else 0,
-            },
-            axis=1
-        )
+        df["victim_type_breakdown"] = build_victim_breakdown(df, vectorized)
 
 
     # -------------------------------------------------------
@@ -128,12 +212,7 @@ def clean_chunk(df):
     # -------------------------------------------------------
     # 8) Ajouter champ géospatial
     # -------------------------------------------------------
-    df["location"] = df.apply(
-        lambda r: {"lat": r["latitude"], "lon": r["longitude"]}
-        if pd.notna(r.get("latitude")) and pd.notna(r.get("longitude"))
-        else None,
-        axis=1
-    )
+    df["location"] = build_location(df, vectorized)
 
     # -------------------------------------------------------
     # 9) Supprimer les lignes vides ou pleines de zéros
@@ -165,30 +244,321 @@ def clean_chunk(df):
     return df
 
 # -------------------------------------------------------
-# 11. Fonction principale
+# 11. Sérialisation (JSONL / Parquet / Arrow)
+# -------------------------------------------------------
+def with_int_columns(df):
+    """Colonnes entières en Int64 nullable : 12 et non 12.0 en JSONL, comme en Parquet / Arrow."""
+    cols = {c: pd.to_numeric(df[c], errors="coerce").round().astype("Int64") for c in INT_COLUMNS
+            if c in df.columns and not pd.api.types.is_integer_dtype(df[c])}
+    return df.assign(**cols) if cols else df
+
+
+def to_jsonl_rowwise(cleaned):
+    lines = []
+    for record in cleaned.to_dict(orient="records"):
+        for col in INT_COLUMNS:
+            if record.get(col) is pd.NA:
+                record[col] = None
+        if "date" in record and not isinstance(record["date"], str):
+            try:
+                record["date"] = record["date"].isoformat() if pd.notna(record["date"]) else None
+            except:
+                record["date"] = None
+        lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+    return "".join(lines)
+
+
+def iso_dates(dates):
+    """Dates UTC -> chaînes ISO (même rendu que Timestamp.isoformat()), None si NaT."""
+    iso = dates.dt.strftime("%Y-%m-%dT%H:%M:%S+00:00")
+    frac = dates.dt.microsecond > 0
+    if frac.any():
+        iso[frac] = dates[frac].dt.strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+    return iso.astype(object).where(dates.notna(), None)
+
+
+def _json_default(value):
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return str(value)
+
+
+def to_jsonl(cleaned):
+    """Sérialisation du chunk entier en un seul bloc d'octets (NaN -> null)."""
+    if cleaned.empty:
+        return b""
+    out = cleaned
+    if "date" in out.columns and pd.api.types.is_datetime64_any_dtype(out["date"]):
+        out = out.assign(date=iso_dates(out["date"]))
+
+    if orjson is None:
+        text = out.to_json(orient="records", lines=True, force_ascii=False,
+                           double_precision=15, default_handler=str)
+        return (text if text.endswith("\n") else text + "\n").encode("utf-8")
+
+    cols = list(out.columns)
+    values = [out[c].tolist() for c in cols]
+    dumps, opt = orjson.dumps, orjson.OPT_APPEND_NEWLINE
+    return b"".join(
+        dumps(dict(zip(cols, row)), default=_json_default, option=opt)
+        for row in zip(*values)
+    )
+
+
+def arrow_schema(cleaned):
+    """
+    Schéma Arrow du chunk : types fixés pour les colonnes connues,
+    types inférés pour le reste (colonnes vides -> string).
+    """
+    known = {
+        "date": pa.timestamp("us", tz="UTC"),
+        "district": pa.int64(),
+        "year": pa.int64(),
+        "victims_count": pa.int64(),
+        "x_coord": pa.float64(),
+        "y_coord": pa.float64(),
+        "severity": pa.float64(),
+        "risk_location_score": pa.float64(),
+        "victim_type_breakdown": pa.struct([
+            ("physical", pa.int64()),
+            ("psychological", pa.int64()),
+            ("property", pa.int64()),
+        ]),
+        "location": pa.struct([("lat", pa.float64()), ("lon", pa.float64())]),
+    }
+    fields = []
+    for f in pa.Schema.from_pandas(cleaned, preserve_index=False):
+        t = known.get(f.name)
+        # victim_type_breakdown reste texte si les colonnes num_* étaient absentes
+        if t is not None and pa.types.is_struct(t) and not (
+                pa.types.is_struct(f.type) or pa.types.is_null(f.type)):
+            t = None
+        if t is None:
+            t = pa.string() if pa.types.is_null(f.type) else f.type
+        fields.append(pa.field(f.name, t))
+    return pa.schema(fields)
+
+
+def to_arrow(cleaned):
+    return pa.Table.from_pandas(cleaned, schema=arrow_schema(cleaned), preserve_index=False)
+
+
+def process_chunk(chunk, fmt="jsonl", vectorized=True):
+    """
+    Nettoie et sérialise un chunk (exécuté dans un worker en mode --workers).
+    Retourne (ids, payload, nb de lignes lues) ; ids suit l'ordre des lignes.
+    payload : octets JSONL, ou table Arrow pour parquet / arrow.
+    """
+    cleaned = with_int_columns(clean_chunk(chunk, vectorized))
+    if not vectorized:
+        payload = to_jsonl_rowwise(cleaned).encode("utf-8")
+    elif fmt == "jsonl":
+        payload = to_jsonl(cleaned)
+    else:
+        payload = to_arrow(cleaned)
+    ids = cleaned["id"].to_numpy(dtype=object) if "id" in cleaned.columns else None
+    return ids, payload, len(chunk)
+
+
+class JsonlSink:
+    """Écriture JSONL bufferisée : un seul write par chunk."""
+
+    def __init__(self, path):
+        self.f = open(path, "wb", buffering=1 << 20)
+
+    def write(self, payload, keep=None):
+        if keep is not None and not keep.all():
+            lines = payload.split(b"\n")[:-1]
+            payload = b"".join(line + b"\n" for line, k in zip(lines, keep) if k)
+        self.f.write(payload)
+        return payload.count(b"\n")
+
+    def close(self):
+        self.f.close()
+
+
+class ColumnarSink:
+    """
+    Écriture Parquet / Arrow IPC : un row group (ou record batch) par chunk.
+    Le schéma du premier chunk fait foi ; les suivants y sont convertis.
+    """
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self.schema = None
+        self.writer = None
+
+    def _open(self, schema):
+        self.schema = schema
+        if self.fmt == "parquet":
+            self.writer = pq.ParquetWriter(self.path, schema, compression="zstd")
+        else:
+            options = pa.ipc.IpcWriteOptions(compression="zstd")
+            self.writer = pa.ipc.new_file(self.path, schema, options=options)
+
+    def write(self, table, keep=None):
+        if keep is not None and not keep.all():
+            table = table.filter(pa.array(keep))
+        if self.writer is None:
+            self._open(table.schema)
+        elif table.schema != self.schema:
+            table = table.select(self.schema.names).cast(self.schema)
+        if self.fmt == "parquet":
+            self.writer.write_table(table, row_group_size=max(table.num_rows, 1))
+        else:
+            self.writer.write_table(table.combine_chunks(), max_chunksize=max(table.num_rows, 1))
+        return table.num_rows
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def open_sink(path, fmt):
+    if fmt == "jsonl":
+        return JsonlSink(path)
+    if pa is None:
+        raise SystemExit(f"pyarrow est requis pour --format {fmt} (pip install pyarrow)")
+    return ColumnarSink(path, fmt)
+
+
+# -------------------------------------------------------
+# 12. Déduplication globale des IDs
 # -------------------------------------------------------
-def main(csv_path, out_path, chunksize=20000):
+class SeenIds:
+    """
+    Ensemble compact des IDs déjà écrits, sur tout le fichier.
+    - IDs entiers positifs : bitmap NumPy (1 bit par ID possible, ~1,8 Mo
+      pour les 14 M d'IDs Chicago), agrandi à la demande
+    - autres IDs (texte, négatifs, trop grands) : set de hash 64 bits
+    """
+    MAX_BITMAP_ID = 1 << 32
+
+    def __init__(self, initial_ids=1 << 24):
+        self.bitmap = np.zeros(initial_ids >> 3, dtype=np.uint8)
+        self.hashed = set()
+
+    def _grow(self, max_id):
+        size = len(self.bitmap)
+        while (size << 3) <= max_id:
+            size *= 2
+        if size != len(self.bitmap):
+            bitmap = np.zeros(size, dtype=np.uint8)
+            bitmap[:len(self.bitmap)] = self.bitmap
+            self.bitmap = bitmap
+
+    def add_new(self, ids):
+        """Marque les IDs comme vus ; retourne le masque des lignes à garder."""
+        raw = pd.Series(ids, dtype=object)
+        numeric = pd.to_numeric(raw, errors="coerce")
+        ok = (numeric.notna() & (numeric >= 0) & (numeric < self.MAX_BITMAP_ID)
+              & (numeric == numeric.round())).to_numpy()
+        keep = np.ones(len(raw), dtype=bool)
+
+        if ok.any():
+            values = numeric.to_numpy()[ok].astype(np.int64)
+            self._grow(int(values.max()))
+            byte, bit = values >> 3, (1 << (values & 7)).astype(np.uint8)
+            first = np.zeros(len(values), dtype=bool)
+            first[np.unique(values, return_index=True)[1]] = True
+            new = first & ((self.bitmap[byte] & bit) == 0)
+            np.bitwise_or.at(self.bitmap, byte[new], bit[new])
+            keep[ok] = new
+
+        for pos in np.flatnonzero(~ok):
+            value = raw.iat[pos]
+            if value is None or (isinstance(value, float) and np.isnan(value)):
+                continue  # pas d'ID : rien à dédupliquer
+            key = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "little")
+            if key in self.hashed:
+                keep[pos] = False
+            else:
+                self.hashed.add(key)
+        return keep
+
+
+# -------------------------------------------------------
+# 13. Mesure du débit (ligne à ligne vs vectorisé)
+# -------------------------------------------------------
+def bench(csv_path, chunksize=20000):
+    chunk = next(pd.read_csv(csv_path, chunksize=chunksize, dtype=str, low_memory=False))
+    rates = {}
+    for name, vectorized in (("ligne à ligne", False), ("vectorisé", True)):
+        start = time.perf_counter()
+        process_chunk(chunk, vectorized=vectorized)
+        elapsed = time.perf_counter() - start
+        rates[name] = len(chunk) / elapsed
+        print(f"{name:>14} : {rates[name]:,.0f} lignes/s ({elapsed:.2f} s pour {len(chunk)} lignes)")
+    print(f"Accélération : x{rates['vectorisé'] / rates['ligne à ligne']:.1f}")
+
+
+# -------------------------------------------------------
+# 14. Fonction principale
+# -------------------------------------------------------
+def iter_results(chunks, workers, fmt="jsonl"):
+    """
+    Résultats de process_chunk dans l'ordre des chunks d'entrée.
+    Avec workers > 1, les chunks partent dans un pool de processus ; au plus
+    2 * workers chunks sont en vol pour borner la mémoire.
+    """
+    work = partial(process_chunk, fmt=fmt)
+    if workers <= 1:
+        for chunk in chunks:
+            yield work(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(work, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def main(csv_path, out_path, chunksize=20000, workers=1, fmt="jsonl"):
     total = 0
-    with open(out_path, "w", encoding="utf-8") as writer:
-        for chunk in tqdm(pd.read_csv(csv_path, chunksize=chunksize, dtype=str, low_memory=False)):
-            cleaned = clean_chunk(chunk)
+    rows_in = 0
+    duplicates = 0
+    seen = SeenIds()
+    start = time.perf_counter()
+    chunks = pd.read_csv(csv_path, chunksize=chunksize, dtype=str, low_memory=False)
 
-            for record in cleaned.to_dict(orient="records"):
-                if "date" in record and not isinstance(record["date"], str):
-                    try:
-                        record["date"] = record["date"].isoformat()
-                    except:
-                        record["date"] = None
-                writer.write(json.dumps(record, ensure_ascii=False) + "\n")
-                total += 1
+    # écrivain unique : ordre d'entrée conservé, doublons filtrés sur tout le fichier
+    sink = open_sink(out_path, fmt)
+    try:
+        for ids, payload, n_in in tqdm(iter_results(chunks, workers, fmt)):
+            rows_in += n_in
+            keep = seen.add_new(ids) if ids is not None else None
+            if keep is not None:
+                duplicates += int((~keep).sum())
+            total += sink.write(payload, keep)
+    finally:
+        sink.close()
 
-    print(f"✔ Nettoyage terminé — {total} documents enregistrés dans {out_path}")
+    elapsed = time.perf_counter() - start
+    print(f"✔ Nettoyage terminé — {total} documents enregistrés dans {out_path}"
+          f" ({duplicates} doublons d'ID ignorés)")
+    print(f"⏱ {rows_in} lignes en {elapsed:.1f} s — {rows_in / max(elapsed, 1e-9):,.0f} lignes/s")
 
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--csv", required=True)
-    parser.add_argument("--out", default="cleaned_crimes.jsonl")
-    parser.add_argument("--chunksize", type=int, default=20000)
-    args = parser.parse_args()
-    main(args.csv, args.out, args.chunksize)
+    # pas "parser" : ce nom masquerait dateutil.parser utilisé par parse_date_safe
+    p = argparse.ArgumentParser()
+    p.add_argument("--csv", required=True)
+    p.add_argument("--out", default=None, help="défaut : cleaned_crimes.<format>")
+    p.add_argument("--format", choices=FORMATS, default="jsonl",
+                   help="jsonl (texte) ou parquet / arrow (colonnes, un row group par chunk)")
+    p.add_argument("--chunksize", type=int, default=20000)
+    p.add_argument("--workers", type=int, default=1,
+                   help="nombre de processus de nettoyage (1 = séquentiel)")
+    p.add_argument("--bench", action="store_true",
+                   help="mesurer le débit ligne à ligne vs vectorisé sur le premier chunk")
+    args = p.parse_args()
+    if args.bench:
+        bench(args.csv, args.chunksize)
+    else:
+        out = args.out or f"cleaned_crimes.{args.format}"
+        main(args.csv, out, args.chunksize, args.workers, args.format)
@@ -5,41 +5,79 @@ Génère dans un seul fichier CSV toutes les colonnes dérivées :
 - severity
 - victims_count, victim_type_breakdown, num_physical_victims, ...
 - risk_location_score (basé sur agrégats par District)
+
+Deux modes :
+- en mémoire (par défaut) : tout le CSV est chargé d'un coup
+- streaming (--chunksize N) : deux passes sur le CSV, mémoire bornée par la
+  taille d'un chunk. La passe 1 ne garde que les agrégats par District, la
+  passe 2 calcule les scores chunk par chunk et les ajoute au fichier de sortie.
+  Les scores de risque sont identiques au mode en mémoire ; la simulation des
+  victimes est reproductible pour un même seed et un même chunksize.
 """
+
+# python data_generation.py --csv crimes.csv --out crimes_fully_enriched.csv
+# python data_generation.py --csv crimes.csv --out crimes_fully_enriched.csv --chunksize 200000
+
+import argparse
 import pandas as pd
 import numpy as np
-import random
 
 # --------------------------
 # Config
 # --------------------------
-INPUT_CSV = r"C:\Users\USER\OneDrive\Documents\city-safety\data\crimes.csv"
-OUTPUT_CSV = r"C:\Users\USER\OneDrive\Documents\city-safety\data\crimes_fully_enriched.csv"
 SEED = 42
 
-random.seed(SEED)
-np.random.seed(SEED)
+# colonnes lues par la passe 1 (agrégats par District)
+PASS1_COLUMNS = ["Date", "Primary Type", "Arrest", "Domestic", "District"]
+
+# poids du score de district (tunables)
+w_crime = 0.4
+w_sev = 0.3
+w_violent = 0.2
+w_night = 0.1
+
+# poids du score final par ligne (tunables)
+w_district = 0.6
+w_severity_row = 0.3
+w_row_effects = 0.1
+
 
 # --------------------------
-# 1. Charger le dataset
+# 1. Normaliser noms utiles
 # --------------------------
-df = pd.read_csv(INPUT_CSV, dtype=str)  # charger en str pour robustesse
- # charger en str pour robustesse
-  # charger en str pour robustesse
-# conserver colonnes originales, mais créer colonnes utilitaires
-# Normaliser noms utiles
-if "Primary Type" not in df.columns:
+def find_primary_type_column(columns):
+    if "Primary Type" in columns:
+        return "Primary Type"
     # gestion de variantes
-    for c in df.columns:
+    for c in columns:
         if c.lower().strip() == "primary type" or c.lower().strip()=="primary_type":
-            df.rename(columns={c: "Primary Type"}, inplace=True)
-            break
+            return c
+    return None
+
+
+def normalize_columns(df):
+    col = find_primary_type_column(df.columns)
+    if col is not None and col != "Primary Type":
+        df.rename(columns={col: "Primary Type"}, inplace=True)
+    return df
+
 
 # --------------------------
 # 2. Parse Date et heure
 # --------------------------
-df["Date_parsed"] = pd.to_datetime(df["Date"], errors="coerce")
-df["hour"] = df["Date_parsed"].dt.hour
+# format du portail Chicago ; fixé pour que le parsing ne dépende pas de
+# l'inférence de pandas sur la première ligne de chaque chunk
+DATE_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+
+
+def parse_dates(values):
+    parsed = pd.to_datetime(values, format=DATE_FORMAT, errors="coerce")
+    failed = parsed.isna() & values.notna()
+    if failed.any():
+        # autres formats : parsing élément par élément, seulement sur ces lignes
+        parsed[failed] = pd.to_datetime(values[failed], format="mixed", errors="coerce")
+    return parsed
+
 
 def get_period(hour):
     if pd.isna(hour):
@@ -54,7 +92,6 @@ def get_period(hour):
     else:
         return "Night"
 
-df["period_of_day"] = df["hour"].apply(get_period)
 
 # --------------------------
 # 3. severity (score 1..5)
@@ -100,9 +137,6 @@ severity_map = {
     "NON-CRIMINAL": 0
 }
 
-# Appliquer en normalisant le texte
-df["Primary Type_norm"] = df["Primary Type"].fillna("").astype(str).str.upper().str.strip()
-df["severity"] = df["Primary Type_norm"].map(severity_map).fillna(1).astype(float)
 
 # --------------------------
 # 4. victims_count + breakdown réaliste
@@ -153,35 +187,60 @@ victim_profile = {
 }
 
 
-def generate_victims(primary_type):
-    pt = str(primary_type).upper().strip()
-    if pt in victim_profile:
-        mn, mx, probs = victim_profile[pt]
-    else:
-        mn, mx, probs = 1, 2, {"physical": 0.1, "psychological": 0.5, "property": 0.4}
-    mn = max(1, int(mn))
-    mx = max(mn, int(mx))
-    count = int(np.random.randint(mn, mx + 1))
-    physical = psychological = property_loss = 0
-    for _ in range(count):
-        if random.random() < probs.get("physical", 0):
-            physical += 1
-        if random.random() < probs.get("psychological", 0):
-            psychological += 1
-        if random.random() < probs.get("property", 0):
-            property_loss += 1
+# profil par défaut pour les types absents de victim_profile
+DEFAULT_VICTIM_PROFILE = (1, 2, {"physical": 0.1, "psychological": 0.5, "property": 0.4})
+VICTIM_CATEGORIES = ("physical", "psychological", "property")
+
+
+def build_victim_table(profile):
+    """
+    Transforme victim_profile en tables NumPy indexées par code de type.
+    La dernière ligne correspond au profil par défaut (types inconnus).
+    """
+    types = list(profile.keys())
+    rows = [profile[t] for t in types] + [DEFAULT_VICTIM_PROFILE]
+    mins = np.array([max(1, int(mn)) for mn, _, _ in rows], dtype=np.int64)
+    maxs = np.array([max(max(1, int(mn)), int(mx)) for mn, mx, _ in rows], dtype=np.int64)
+    probs = np.array(
+        [[p.get(c, 0) for c in VICTIM_CATEGORIES] for _, _, p in rows],
+        dtype=float
+    )
+    return pd.Index(types), mins, maxs, probs
+
+
+VICTIM_TYPES, VICTIM_MIN, VICTIM_MAX, VICTIM_PROBS = build_victim_table(victim_profile)
+
+
+def generate_victims_batch(primary_types, rng):
+    """
+    Simule les victimes pour toutes les lignes d'un coup.
+    - nombre de victimes tiré uniformément dans [min, max] du type
+    - nombre de victimes par catégorie tiré par loi binomiale (count, p)
+    Retourne un dict de tableaux prêts à être écrits dans le DataFrame.
+    """
+    pt = pd.Series(primary_types).fillna("").astype(str).str.upper().str.strip()
+    codes = VICTIM_TYPES.get_indexer(pt)
+    codes[codes < 0] = len(VICTIM_TYPES)
+
+    count = rng.integers(VICTIM_MIN[codes], VICTIM_MAX[codes] + 1)
+    outcomes = rng.binomial(count[:, None], VICTIM_PROBS[codes])
+    physical, psychological, property_loss = outcomes.T.copy()
+
     # garantir au moins un impact si tous nuls
-    if physical + psychological + property_loss == 0:
-        psychological = 1
-    breakdown = f"physical:{physical}|psychological:{psychological}|property:{property_loss}"
-    return count, breakdown, physical, psychological, property_loss
-
-victims = df["Primary Type_norm"].apply(lambda t: generate_victims(t))
-df["victims_count"] = victims.apply(lambda x: x[0])
-df["victim_type_breakdown"] = victims.apply(lambda x: x[1])
-df["num_physical_victims"] = victims.apply(lambda x: x[2])
-df["num_psychological_victims"] = victims.apply(lambda x: x[3])
-df["num_property_victims"] = victims.apply(lambda x: x[4])
+    psychological[outcomes.sum(axis=1) == 0] = 1
+
+    breakdown = (
+        "physical:" + pd.Series(physical).astype(str)
+        + "|psychological:" + pd.Series(psychological).astype(str)
+        + "|property:" + pd.Series(property_loss).astype(str)
+    )
+    return {
+        "victims_count": count,
+        "victim_type_breakdown": breakdown.to_numpy(),
+        "num_physical_victims": physical,
+        "num_psychological_victims": psychological,
+        "num_property_victims": property_loss,
+    }
 
 # --------------------------
 # 5. Préparer colonnes utilitaires pour risk calc
@@ -193,9 +252,6 @@ def parse_bool(x):
     s = str(x).strip().lower()
     return s in ("true","t","yes","y","1","1.0")
 
-df["Arrest_bool"] = df.get("Arrest", "").apply(parse_bool)
-df["Domestic_bool"] = df.get("Domestic", "").apply(parse_bool)
-
 # Convertir District en int si possible
 def to_int_safe(x):
     try:
@@ -203,7 +259,59 @@ def to_int_safe(x):
     except Exception:
         return np.nan
 
-df["District_int"] = df.get("District", "").apply(to_int_safe)
+
+def add_row_features(df):
+    """Colonnes déterministes ligne à ligne : date, heure, période, severity."""
+    normalize_columns(df)
+    df["Date_parsed"] = parse_dates(df["Date"])
+    # Int64 : même format d'heure dans tous les chunks, même avec des dates invalides
+    df["hour"] = df["Date_parsed"].dt.hour.astype("Int64")
+    df["period_of_day"] = df["hour"].apply(get_period)
+
+    # Appliquer en normalisant le texte
+    df["Primary Type_norm"] = df["Primary Type"].fillna("").astype(str).str.upper().str.strip()
+    df["severity"] = df["Primary Type_norm"].map(severity_map).fillna(1).astype(float)
+    return df
+
+
+def add_victims(df, rng):
+    victims = generate_victims_batch(df["Primary Type_norm"].to_numpy(), rng)
+    for col, values in victims.items():
+        df[col] = values
+    return df
+
+
+def add_flags(df):
+    """Booléens Arrest/Domestic, District et effets individuels sur le risque."""
+    for src, dst in (("Arrest", "Arrest_bool"), ("Domestic", "Domestic_bool")):
+        if src in df.columns:
+            df[dst] = df[src].apply(parse_bool)
+        else:
+            df[dst] = False
+
+    district = df["District"] if "District" in df.columns else pd.Series(np.nan, index=df.index)
+    df["District_int"] = district.apply(to_int_safe).astype("Int64")
+    # remplacer NaN District par -1 (zone inconnue)
+    df["District_group"] = df["District_int"].fillna(-1).astype(int)
+
+    # ajouter effets d'arrest/domestic individuels :
+    # - domestic augmente le risque local (facteur)
+    # - arrest diminue le risque local (car présence de contrôle)
+    df["domestic_increase"] = np.where(df["Domestic_bool"], 0.1, 0.0)
+    df["arrest_decrease"] = np.where(df["Arrest_bool"], -0.1, 0.0)
+
+    # normalize severity row to 0..1
+    df["severity_norm_row"] = (df["severity"] - 1) / (5 - 1)
+    return df
+
+
+def row_risk_part(df):
+    """Partie du risk_raw qui ne dépend que de la ligne (hors score de district)."""
+    return (
+        w_severity_row * df["severity_norm_row"] +
+        w_row_effects * (df["domestic_increase"] + df["arrest_decrease"])
+    )
+
 
 # --------------------------
 # 6. Agrégats par District (pour calculer risk_location_score)
@@ -211,82 +319,77 @@ df["District_int"] = df.get("District", "").apply(to_int_safe)
 #    - avg_severity per district
 #    - violent_ratio per district (severity >=4)
 #    - night_ratio per district (period_of_day == Night)
+#    Les agrégats sont additifs : on peut les cumuler chunk par chunk.
+#    row_min/row_max servent à retrouver le min/max global de risk_raw
+#    sans relire les lignes (le score de district est constant par groupe).
 # --------------------------
-# remplacer NaN District par -1 (zone inconnue)
-df["District_group"] = df["District_int"].fillna(-1).astype(int)
-
-agg = df.groupby("District_group").agg(
-    crime_count = ("Primary Type_norm", "count"),
-    avg_severity = ("severity", "mean"),
-    violent_count = ("severity", lambda s: (s>=4).sum()),
-    night_count = ("period_of_day", lambda s: (s=="Night").sum())
-).reset_index()
-
-# calculs normalisés
-agg["crime_count_norm"] = agg["crime_count"] / agg["crime_count"].max()
-# severity already in 1..5 -> normalize to 0..1
-agg["avg_severity_norm"] = (agg["avg_severity"] - 1) / (5 - 1)
-agg["violent_ratio"] = np.where(agg["crime_count"]>0, agg["violent_count"]/agg["crime_count"], 0)
-agg["night_ratio"] = np.where(agg["crime_count"]>0, agg["night_count"]/agg["crime_count"], 0)
-
-# combine weights into district risk base (weights tunables)
-w_crime = 0.4
-w_sev = 0.3
-w_violent = 0.2
-w_night = 0.1
-
-agg["district_raw_risk"] = (
-    w_crime * agg["crime_count_norm"] +
-    w_sev * agg["avg_severity_norm"] +
-    w_violent * agg["violent_ratio"] +
-    w_night * agg["night_ratio"]
-)
-
-# Normaliser district_raw_risk 0..1
-minv = agg["district_raw_risk"].min()
-maxv = agg["district_raw_risk"].max()
-if maxv - minv > 0:
-    agg["district_risk_norm"] = (agg["district_raw_risk"] - minv) / (maxv - minv)
-else:
-    agg["district_risk_norm"] = 0.0
-
-# --------------------------
-# 7. Mapper les scores de district dans le DataFrame principal
-# --------------------------
-agg_map = agg.set_index("District_group")["district_risk_norm"].to_dict()
-df["district_risk_norm"] = df["District_group"].map(agg_map).fillna(0.0)
-
-# ajouter effets d'arrest/domestic individuels :
-# - domestic augmente le risque local (facteur)
-# - arrest diminue le risque local (car présence de contrôle)
-df["domestic_increase"] = df["Domestic_bool"].apply(lambda x: 0.1 if x else 0.0)
-df["arrest_decrease"] = df["Arrest_bool"].apply(lambda x: -0.1 if x else 0.0)
-
-# combine final risk per record: base district score modifié par row-level effects and severity
-# weights (tunable)
-w_district = 0.6
-w_severity_row = 0.3
-w_row_effects = 0.1
-
-# normalize severity row to 0..1
-df["severity_norm_row"] = (df["severity"] - 1) / (5 - 1)
+def district_partials(df):
+    return df.assign(
+        _violent=df["severity"] >= 4,
+        _night=df["period_of_day"] == "Night",
+        _row=row_risk_part(df),
+    ).groupby("District_group").agg(
+        crime_count = ("Primary Type_norm", "count"),
+        severity_sum = ("severity", "sum"),
+        violent_count = ("_violent", "sum"),
+        night_count = ("_night", "sum"),
+        row_min = ("_row", "min"),
+        row_max = ("_row", "max"),
+    )
+
+
+def merge_partials(acc, part):
+    if acc is None:
+        return part
+    return pd.concat([acc, part]).groupby(level=0).agg({
+        "crime_count": "sum",
+        "severity_sum": "sum",
+        "violent_count": "sum",
+        "night_count": "sum",
+        "row_min": "min",
+        "row_max": "max",
+    })
+
+
+def district_risk(partials):
+    """
+    Calcule district_risk_norm par District et le min/max global de risk_raw.
+    Retourne (agg_map, min_r, max_r).
+    """
+    agg = partials.copy()
+    agg["avg_severity"] = agg["severity_sum"] / agg["crime_count"]
+
+    # calculs normalisés
+    agg["crime_count_norm"] = agg["crime_count"] / agg["crime_count"].max()
+    # severity already in 1..5 -> normalize to 0..1
+    agg["avg_severity_norm"] = (agg["avg_severity"] - 1) / (5 - 1)
+    agg["violent_ratio"] = np.where(agg["crime_count"]>0, agg["violent_count"]/agg["crime_count"], 0)
+    agg["night_ratio"] = np.where(agg["crime_count"]>0, agg["night_count"]/agg["crime_count"], 0)
+
+    # combine weights into district risk base
+    agg["district_raw_risk"] = (
+        w_crime * agg["crime_count_norm"] +
+        w_sev * agg["avg_severity_norm"] +
+        w_violent * agg["violent_ratio"] +
+        w_night * agg["night_ratio"]
+    )
+
+    # Normaliser district_raw_risk 0..1
+    minv = agg["district_raw_risk"].min()
+    maxv = agg["district_raw_risk"].max()
+    if maxv - minv > 0:
+        agg["district_risk_norm"] = (agg["district_raw_risk"] - minv) / (maxv - minv)
+    else:
+        agg["district_risk_norm"] = 0.0
 
-df["risk_raw"] = (
-    w_district * df["district_risk_norm"] +
-    w_severity_row * df["severity_norm_row"] +
-    w_row_effects * (df["domestic_increase"] + df["arrest_decrease"])
-)
+    # risk_raw = w_district * district_risk_norm + partie ligne
+    min_r = (w_district * agg["district_risk_norm"] + agg["row_min"]).min()
+    max_r = (w_district * agg["district_risk_norm"] + agg["row_max"]).max()
+    return agg["district_risk_norm"].to_dict(), min_r, max_r
 
-# final normalization 0..1 across all records
-min_r = df["risk_raw"].min()
-max_r = df["risk_raw"].max()
-if max_r - min_r > 0:
-    df["risk_location_score"] = (df["risk_raw"] - min_r) / (max_r - min_r)
-else:
-    df["risk_location_score"] = 0.0
 
 # --------------------------
-# 8. Catégorie lisible (Low/Medium/High)
+# 7. Mapper les scores de district dans le DataFrame principal
 # --------------------------
 def risk_level(score):
     if score >= 0.66:
@@ -296,12 +399,30 @@ def risk_level(score):
     else:
         return "Low"
 
-df["risk_level"] = df["risk_location_score"].apply(risk_level)
+
+def score_chunk(df, agg_map, min_r, max_r):
+    df["district_risk_norm"] = df["District_group"].map(agg_map).fillna(0.0)
+
+    # combine final risk per record: base district score modifié par row-level effects and severity
+    df["risk_raw"] = w_district * df["district_risk_norm"] + row_risk_part(df)
+
+    # final normalization 0..1 across all records (min/max globaux issus des agrégats)
+    if max_r - min_r > 0:
+        df["risk_location_score"] = ((df["risk_raw"] - min_r) / (max_r - min_r)).clip(0.0, 1.0)
+    else:
+        df["risk_location_score"] = 0.0
+
+    # --------------------------
+    # 8. Catégorie lisible (Low/Medium/High)
+    # --------------------------
+    df["risk_level"] = df["risk_location_score"].apply(risk_level)
+    return df
+
 
 # --------------------------
 # 9. Sauvegarde du fichier unique
 # --------------------------
-# Colonnes à conserver: originales + nouvelles
+# Colonnes ajoutées aux colonnes originales
 new_cols = [
     "period_of_day", "hour", "severity",
     "victims_count", "victim_type_breakdown",
@@ -309,6 +430,69 @@ new_cols = [
     "district_risk_norm","risk_location_score","risk_level",
     "Arrest_bool","Domestic_bool"
 ]
-# écrire tout le DF (original + nouvelles colonnes)
-df.to_csv(OUTPUT_CSV, index=False, encoding="utf-8")
-print(f"Fichier enrichi sauvegardé → {OUTPUT_CSV}")
+
+
+def enrich_in_memory(input_csv, output_csv, seed=SEED):
+    rng = np.random.default_rng(seed)
+    df = pd.read_csv(input_csv, dtype=str)  # charger en str pour robustesse
+
+    add_row_features(df)
+    add_victims(df, rng)
+    add_flags(df)
+
+    agg_map, min_r, max_r = district_risk(district_partials(df))
+    score_chunk(df, agg_map, min_r, max_r)
+
+    # écrire tout le DF (original + nouvelles colonnes)
+    df.to_csv(output_csv, index=False, encoding="utf-8")
+    return len(df)
+
+
+def enrich_streaming(input_csv, output_csv, chunksize, seed=SEED):
+    rng = np.random.default_rng(seed)
+
+    # Passe 1 : agrégats par District uniquement (colonnes utiles seulement)
+    header = pd.read_csv(input_csv, dtype=str, nrows=0).columns
+    pt_col = find_primary_type_column(header)
+    usecols = [c for c in PASS1_COLUMNS if c in header and c != "Primary Type"] + [pt_col]
+
+    partials = None
+    for chunk in pd.read_csv(input_csv, dtype=str, usecols=usecols, chunksize=chunksize):
+        add_row_features(chunk)
+        add_flags(chunk)
+        partials = merge_partials(partials, district_partials(chunk))
+    if partials is None:
+        raise ValueError(f"Aucune ligne dans {input_csv}")
+    agg_map, min_r, max_r = district_risk(partials)
+    print(f"Passe 1 terminée : {int(partials['crime_count'].sum())} lignes, {len(partials)} districts")
+
+    # Passe 2 : enrichissement complet et écriture chunk par chunk
+    total = 0
+    for i, chunk in enumerate(pd.read_csv(input_csv, dtype=str, chunksize=chunksize)):
+        add_row_features(chunk)
+        add_victims(chunk, rng)
+        add_flags(chunk)
+        score_chunk(chunk, agg_map, min_r, max_r)
+        chunk.to_csv(output_csv, index=False, encoding="utf-8",
+                     mode="w" if i == 0 else "a", header=(i == 0))
+        total += len(chunk)
+    return total
+
+
+def main(input_csv, output_csv, chunksize=None, seed=SEED):
+    if chunksize:
+        total = enrich_streaming(input_csv, output_csv, chunksize, seed)
+    else:
+        total = enrich_in_memory(input_csv, output_csv, seed)
+    print(f"Fichier enrichi sauvegardé → {output_csv} ({total} lignes)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enrichir le CSV des crimes (colonnes dérivées + risque)")
+    parser.add_argument("--csv", required=True, help="CSV brut des crimes")
+    parser.add_argument("--out", default="crimes_fully_enriched.csv")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="mode streaming deux passes (mémoire bornée par le chunk)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+    main(args.csv, args.out, args.chunksize, args.seed)
@@ -1,11 +1,31 @@
 # index_to_es.py
-from pymongo import MongoClient
+# python index_to_es.py --coll crime --index crimes_index
+# python index_to_es.py --coll crime --threads 4 --max-chunk-mb 10 --bulk-load
+# python index_to_es.py --coll crime --incremental
+# python index_to_es.py --coll crime --reconcile
+# python index_to_es.py --coll crime --tail
+# python index_to_es.py --input cleaned_crimes.parquet --threads 4 --bulk-load
+from pymongo import MongoClient, ASCENDING, DESCENDING
+from bson import ObjectId
 from elasticsearch import Elasticsearch, helpers
 import argparse
 from tqdm import tqdm
+import json
 import math
+import queue
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from load_to_mongo import (FORMATS, Progress, bump_generation, decode_batch, detect_format,
+                           read_batches)
+from transform import prepare_doc, to_es_action
 
 ES_INDEX = "crimes_index"
+DEAD_LETTER = "es_dead_letter.jsonl"
+
+# réglages d'index pendant un chargement massif (restaurés à la fin)
+BULK_LOAD_SETTINGS = {"index.refresh_interval": "-1", "index.number_of_replicas": 0}
 
 def connect_mongo(uri, db_name):
     client = MongoClient(uri)
@@ -20,12 +40,14 @@ def connect_es(es_host):
 def create_es_index(es, index_name):
     mapping = {
         "mappings": {
+            # suggest n'est qu'une structure de recherche : pas renvoyé dans les hits
+            "_source": {"excludes": ["suggest"]},
             "properties": {
                 "case_number": {"type": "keyword"},
                 "primary_type": {"type": "keyword"},
                 "description": {"type": "text"},
                 "location_description": {"type": "keyword"},
-                "district": {"type": "keyword"},
+                "district": {"type": "integer"},
                 "community_area": {"type": "keyword"},
                 "date": {"type": "date"},
                 "year": {"type": "integer"},
@@ -42,14 +64,18 @@ def create_es_index(es, index_name):
                 "y_coord": {"type": "float"},
                 "Updated_On": {"type": "text"},
                 "Date_parsed": {"type": "text"},
-                "hour": {"type": "keyword"},
+                "hour": {"type": "integer"},
                 "period_of_day": {"type": "keyword"},
                 "severity": {"type": "float"},
+                "severity_label": {"type": "keyword"},
                 "victims_count": {"type": "integer"},
                 "severity_norm_row": {"type": "float"},
                 "risk_raw": {"type": "float"},
                 "risk_location_score": {"type": "float"},
                 "risk_level": {"type": "keyword"},
+                "victim_type_selected": {"type": "keyword"},
+                # saisie semi-automatique (/api/suggest) : FST en mémoire, préfixes en quelques ms
+                "suggest": {"type": "completion"},
                 "victim_type_breakdown": {
                     "properties": {
                         "physical": {"type": "integer"},
@@ -63,11 +89,174 @@ def create_es_index(es, index_name):
 
     if es.indices.exists(index=index_name):
         print(f"Index {index_name} existe déjà.")
+        check_mapping(es, index_name, mapping["mappings"]["properties"])
     else:
         es.indices.create(index=index_name, body=mapping)
         print(f"Index {index_name} créé.")
 
-def mongo_to_es(mongo_uri, db_name, coll_name, es_host, index_name, batch_size=500):
+def check_mapping(es, index_name, expected):
+    """Signale les champs d'un index existant dont le type diffère du mapping attendu."""
+    res = es.indices.get_mapping(index=index_name)
+    for name, body in res.items():
+        actual = body["mappings"].get("properties", {})
+        stale = [
+            f"{field} ({actual[field].get('type', 'object')} -> {spec['type']})"
+            for field, spec in expected.items()
+            if "type" in spec and field in actual
+            and actual[field].get("type", "object") != spec["type"]
+        ]
+        if stale:
+            print(f"⚠ Mapping obsolète sur {name} : {', '.join(stale)}. "
+                  f"Supprimer l'index et réindexer pour en profiter.")
+
+
+# ------------------------------------------------------------------
+# Mode chargement massif : refresh et réplicas coupés pendant l'import
+# ------------------------------------------------------------------
+def begin_bulk_load(es, index_name):
+    """
+    Applique BULK_LOAD_SETTINGS et retourne les réglages à restaurer, par
+    index concret (index_name peut être un alias).
+    """
+    res = es.indices.get_settings(index=index_name, flat_settings=True)
+    # None = revenir à la valeur par défaut si le réglage n'était pas explicite
+    previous = {name: {k: body["settings"].get(k) for k in BULK_LOAD_SETTINGS}
+                for name, body in res.items()}
+    es.indices.put_settings(index=index_name, settings=BULK_LOAD_SETTINGS)
+    print(f"Chargement massif : refresh et réplicas désactivés sur {', '.join(previous)}")
+    return previous
+
+
+def end_bulk_load(es, index_name, previous, force_merge=True, failed=False):
+    """
+    Fin du chargement massif. Après un import réussi : force-merge tant que
+    les réplicas sont coupés (ils copient ensuite les segments fusionnés au
+    lieu de refaire la fusion), puis restauration des réglages. Après un
+    échec : restauration seule, et une erreur ici ne masque pas l'originale.
+    """
+    if force_merge and not failed:
+        start = time.perf_counter()
+        try:
+            es.indices.refresh(index=index_name)   # refresh coupé : vider le buffer en segments
+            es.options(request_timeout=3600).indices.forcemerge(index=index_name, max_num_segments=1)
+            print(f"Force-merge terminé en {time.perf_counter() - start:.1f} s")
+        except Exception as e:
+            print(f"⚠ Force-merge de {index_name} échoué ({e!r}), réglages restaurés quand même")
+    try:
+        for name, settings in previous.items():
+            es.indices.put_settings(index=name, settings=settings)
+            print(f"Réglages restaurés sur {name} : {settings}")
+        es.indices.refresh(index=index_name)
+    except Exception as e:
+        if not failed:
+            raise
+        print(f"⚠ Réglages non restaurés sur {index_name} ({e!r}) : {previous}")
+
+
+# ------------------------------------------------------------------
+# Bulk parallèle : N threads streaming_bulk alimentés par une file bornée.
+# streaming_bulk découpe par nombre de docs ET par octets et réessaie
+# les 429 avec backoff exponentiel.
+# ------------------------------------------------------------------
+_STOP = object()
+
+
+def _drain(tasks):
+    while True:
+        action = tasks.get()
+        if action is _STOP:
+            return
+        yield action
+
+
+class DeadLetter:
+    """Fichier JSONL des documents rejetés, avec la raison du rejet."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.f = None
+        self.count = 0
+
+    def write(self, info):
+        op, item = next(iter(info.items()))
+        entry = {
+            "_id": item.get("_id"),
+            "op": op,
+            "status": item.get("status"),
+            "error": item.get("error"),
+        }
+        with self.lock:
+            if self.f is None:
+                self.f = open(self.path, "w", encoding="utf-8")
+            self.f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+            self.count += 1
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+
+
+def bulk_worker(es, tasks, stats, wid, dead_letter, errors, chunk_size, max_chunk_bytes,
+                max_retries, initial_backoff):
+    ok_count = 0
+    try:
+        for ok, info in helpers.streaming_bulk(
+                es, _drain(tasks),
+                chunk_size=chunk_size,
+                max_chunk_bytes=max_chunk_bytes,
+                max_retries=max_retries,
+                initial_backoff=initial_backoff,
+                max_backoff=60,
+                raise_on_error=False,
+                raise_on_exception=False,
+                ignore_status=(404,),   # suppression d'un doc déjà absent
+                yield_ok=True):
+            if ok:
+                ok_count += 1
+            else:
+                dead_letter.write(info)
+    except Exception as e:
+        # 429 persistants après max_retries : on arrête proprement
+        errors.append(e)
+        for _ in _drain(tasks):
+            pass  # vider la file pour ne pas bloquer le lecteur Mongo
+    stats[wid] = ok_count
+
+
+def run_bulk(es, actions, dead_letter, threads=1, chunk_size=500,
+             max_chunk_bytes=10 * 1024 * 1024, max_retries=5, initial_backoff=2):
+    """Envoie les actions avec `threads` workers ; retourne le nombre de succès."""
+    tasks = queue.Queue(maxsize=chunk_size * threads * 2)
+    stats = {}
+    errors = []
+    workers = [
+        threading.Thread(target=bulk_worker, daemon=True,
+                         args=(es, tasks, stats, i, dead_letter, errors, chunk_size,
+                               max_chunk_bytes, max_retries, initial_backoff))
+        for i in range(threads)
+    ]
+    for w in workers:
+        w.start()
+    try:
+        for action in actions:
+            if errors:
+                break
+            tasks.put(action)
+    finally:
+        for _ in workers:
+            tasks.put(_STOP)
+        for w in workers:
+            w.join()
+    if errors:
+        raise RuntimeError(f"Indexation interrompue : {errors[0]!r}")
+    return sum(stats.values())
+
+
+def mongo_to_es(mongo_uri, db_name, coll_name, es_host, index_name, batch_size=500,
+                threads=1, max_chunk_bytes=10 * 1024 * 1024, max_retries=5,
+                initial_backoff=2, bulk_load=False, force_merge=True,
+                dead_letter_path=DEAD_LETTER):
     db = connect_mongo(mongo_uri, db_name)
     coll = db[coll_name]
     es = connect_es(es_host)
@@ -76,69 +265,289 @@ def mongo_to_es(mongo_uri, db_name, coll_name, es_host, index_name, batch_size=5
     total = coll.count_documents({})
     print(f"Documents à indexer : {total}")
 
-    cursor = coll.find({}, no_cursor_timeout=True).batch_size(batch_size)
-    actions = []
-    count = 0
-
-    for doc in tqdm(cursor, total=total):
-
-        es_doc = {
-            "_index": index_name,
-            "_id": str(doc.get("_id")),
-            "_source": {
-                "id": doc.get("id"),
-                "case_number": doc.get("case_number"),
-                "date": doc.get("date"),
-                "block": doc.get("block"),
-                "IUCR": doc.get("IUCR"),
-                "primary_type": doc.get("primary_type"),
-                "description": doc.get("description"),
-                "location_description": doc.get("location_description"),
-                "Arrest": doc.get("Arrest"),
-                "Domestic": doc.get("Domestic"),
-                "district": doc.get("district"),
-                "community_area": doc.get("community_area"),
-                "fbi_code": doc.get("FBI Code"),
-                "x_coord": doc.get("x_coord"),
-                "y_coord": doc.get("y_coord"),
-                "year": doc.get("year"),
-                "Updated_On": doc.get("Updated On"),
-                "Date_parsed": doc.get("Date_parsed"),
-                "hour": doc.get("hour"),
-                "period_of_day": doc.get("period_of_day"),
-                "severity": doc.get("severity"),
-                "victims_count": doc.get("victims_count"),
-                "victim_type_breakdown": doc.get("victim_type_breakdown"),
-                "severity_norm_row": float(doc.get("severity_norm_row") or 0),
-                "risk_raw": float(doc.get("risk_raw") or 0),
-                "risk_location_score": doc.get("risk_location_score"),
-                "risk_level": doc.get("risk_level"),
-            }
-        }
+    # le point de reprise incrémental est pris avant le scan complet
+    state = SyncState(db, coll_name, index_name)
+    mark = state.current_mark(coll)
+
+    previous = begin_bulk_load(es, index_name) if bulk_load else None
+    dead_letter = DeadLetter(dead_letter_path)
+    start = time.perf_counter()
+    loaded = False
+    try:
+        cursor = coll.find({}, no_cursor_timeout=True).batch_size(batch_size)
+        try:
+            actions = (to_es_action(doc, index_name) for doc in tqdm(cursor, total=total))
+            count = run_bulk(es, actions, dead_letter, threads, batch_size,
+                             max_chunk_bytes, max_retries, initial_backoff)
+        finally:
+            cursor.close()
+        loaded = True
+    finally:
+        dead_letter.close()
+        if bulk_load:
+            end_bulk_load(es, index_name, previous, force_merge, failed=not loaded)
+
+    elapsed = time.perf_counter() - start
+    print(f"Total indexing done: {count} ({count / max(elapsed, 1e-9):,.0f} docs/s)")
+    if dead_letter.count:
+        print(f"⚠ {dead_letter.count} documents rejetés → {dead_letter_path}")
+    if mark is not None:
+        state.save(**mark)
+    bump_generation(db, f"index_to_es:{index_name}", mongo_changed=False)
+
+
+# ------------------------------------------------------------------
+# Fichier propre (JSONL / Parquet / Arrow) -> ES, sans passer par Mongo
+# Mêmes _id que load_to_mongo.py : les deux chargements peuvent tourner
+# en parallèle (voir ingest.py pour un seul passage sur le fichier).
+# ------------------------------------------------------------------
+def file_to_es(path, es_host, index_name, fmt=None, batch_size=500, threads=1,
+               max_chunk_bytes=10 * 1024 * 1024, max_retries=5, initial_backoff=2,
+               bulk_load=False, force_merge=True, dead_letter_path=DEAD_LETTER,
+               mongo_uri="mongodb://localhost:27017", db_name="city_safety"):
+    fmt = fmt or detect_format(path)
+    es = connect_es(es_host)
+    create_es_index(es, index_name)
+    print(f"📥 Indexation directe ({fmt}) : {path} → {index_name}")
+
+    stats = Progress(0)   # compteur des lignes JSONL illisibles
+    previous = begin_bulk_load(es, index_name) if bulk_load else None
+    dead_letter = DeadLetter(dead_letter_path)
+    start = time.perf_counter()
+    loaded = False
+    try:
+        actions = (
+            to_es_action(prepare_doc(doc), index_name)
+            for _, raw in read_batches(path, fmt, batch_size)
+            for doc in decode_batch(raw, fmt, stats)
+        )
+        count = run_bulk(es, actions, dead_letter, threads, batch_size,
+                         max_chunk_bytes, max_retries, initial_backoff)
+        loaded = True
+    finally:
+        dead_letter.close()
+        if bulk_load:
+            end_bulk_load(es, index_name, previous, force_merge, failed=not loaded)
+
+    elapsed = time.perf_counter() - start
+    print(f"Total indexing done: {count} ({count / max(elapsed, 1e-9):,.0f} docs/s). "
+          f"Lignes invalides : {stats.get('skipped')}")
+    if dead_letter.count:
+        print(f"⚠ {dead_letter.count} documents rejetés → {dead_letter_path}")
+    # la génération vit dans Mongo : sans Mongo, l'API retombe sur le TTL de ses caches
+    try:
+        db = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)[db_name]
+        bump_generation(db, f"index_to_es:{index_name}", mongo_changed=False)
+    except Exception as e:
+        print(f"⚠ Génération non incrémentée ({e!r})")
+
+
+# ------------------------------------------------------------------
+# Synchronisation incrémentale Mongo -> ES
+# - high-water mark sur updated_at (posé par load_to_mongo) ou sur _id
+#   (ObjectId croissants des anciens imports), départagé par _id
+# - suppressions : réconciliation complète des _id ES absents de Mongo,
+#   lancée à part (--reconcile) : elle parcourt tout l'index
+# - mode continu : change stream Mongo (replica set requis, même un seul
+#   nœud : mongod --replSet rs0 puis rs.initiate())
+# ------------------------------------------------------------------
+HWM_FIELDS = ("updated_at", "_id")
+# marge : un document horodaté juste avant la synchro peut ne pas être encore visible
+SAFETY_LAG_S = 5
+
+
+class SyncState:
+    """Point de reprise de la synchro, stocké dans la collection sync_state."""
+
+    def __init__(self, db, coll_name, index_name, field="updated_at"):
+        self.coll = db["sync_state"]
+        self.key = f"{coll_name}->{index_name}"
+        self.field = field
 
-        # ➕ Mapping GEO (inchangé)
-        if doc.get("geo") and isinstance(doc["geo"], dict) and doc["geo"].get("coordinates"):
-            lon, lat = doc["geo"]["coordinates"]
-            es_doc["_source"]["geo"] = {"lat": lat, "lon": lon}
+    def load(self):
+        return self.coll.find_one({"_id": self.key}) or {}
 
-        elif doc.get("location") and isinstance(doc["location"], dict):
-            lat = doc["location"].get("lat")
-            lon = doc["location"].get("lon")
-            if lat is not None and lon is not None:
-                es_doc["_source"]["geo"] = {"lat": float(lat), "lon": float(lon)}
+    def save(self, **values):
+        values["synced_at"] = datetime.now(timezone.utc)
+        self.coll.update_one({"_id": self.key}, {"$set": values}, upsert=True)
 
-        actions.append(es_doc)
+    def current_mark(self, coll):
+        """Dernier document selon (field, _id) : high-water mark après un scan complet."""
+        last = coll.find_one({self.field: {"$exists": True}},
+                             sort=[(self.field, DESCENDING), ("_id", DESCENDING)],
+                             projection={self.field: 1})
+        if last is None:
+            return None
+        return {"field": self.field, "value": last[self.field], "last_id": last["_id"]}
 
-        if len(actions) >= batch_size:
-            helpers.bulk(es, actions, raise_on_error=False)
-            count += len(actions)
-            actions = []
 
-    if actions:
-        helpers.bulk(es, actions, raise_on_error=False)
-        count += len(actions)
+def changed_since(field, value, last_id):
+    """Filtre des documents strictement après (value, last_id) dans l'ordre (field, _id)."""
+    if field == "_id":
+        return {"_id": {"$gt": last_id}}
+    return {"$or": [
+        {field: {"$gt": value}},
+        {field: value, "_id": {"$gt": last_id}},
+    ]}
+
+
+def settled_before(field, cutoff):
+    """Borne haute : ignore les écritures trop récentes (reprises au prochain passage)."""
+    if field == "_id":
+        return {"_id": {"$lte": ObjectId.from_datetime(cutoff)}}
+    return {"$or": [{field: {"$lte": cutoff}}, {field: {"$exists": False}}]}
+
+
+def reconcile_deletes(es, coll, index_name, batch_size=1000):
+    """Actions de suppression pour les documents ES qui n'existent plus dans Mongo."""
+    hits = helpers.scan(es, index=index_name, query={"_source": False}, size=batch_size)
+    batch = []
+    for hit in hits:
+        batch.append(hit["_id"])
+        if len(batch) >= batch_size:
+            yield from _missing_in_mongo(coll, index_name, batch)
+            batch = []
+    if batch:
+        yield from _missing_in_mongo(coll, index_name, batch)
+
+
+def _missing_in_mongo(coll, index_name, es_ids):
+    # les _id Mongo sont soit l'id du crime (str), soit des ObjectId (anciens imports)
+    candidates = list(es_ids) + [ObjectId(i) for i in es_ids if ObjectId.is_valid(i)]
+    present = {str(d["_id"]) for d in coll.find({"_id": {"$in": candidates}}, {"_id": 1})}
+    for _id in es_ids:
+        if _id not in present:
+            yield {"_op_type": "delete", "_index": index_name, "_id": _id}
+
+
+def sync_incremental(mongo_uri, db_name, coll_name, es_host, index_name, field="updated_at",
+                     batch_size=500, threads=1, max_chunk_bytes=10 * 1024 * 1024,
+                     max_retries=5, initial_backoff=2, dead_letter_path=DEAD_LETTER):
+    db = connect_mongo(mongo_uri, db_name)
+    coll = db[coll_name]
+    es = connect_es(es_host)
+    create_es_index(es, index_name)
+
+    state = SyncState(db, coll_name, index_name, field)
+    saved = state.load()
+    if saved.get("field") not in (None, field):
+        raise SystemExit(f"Le point de reprise utilise {saved['field']}, pas {field}")
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=SAFETY_LAG_S)
+    query = settled_before(field, cutoff)
+    if "last_id" in saved:
+        query = {"$and": [changed_since(field, saved.get("value"), saved["last_id"]), query]}
+    else:
+        print("Aucun point de reprise : synchronisation complète.")
+
+    total = coll.count_documents(query)
+    print(f"Documents nouveaux ou modifiés : {total}")
+
+    mark = {}
+
+    def actions():
+        cursor = (coll.find(query, no_cursor_timeout=True)
+                  .sort([(field, ASCENDING), ("_id", ASCENDING)])
+                  .batch_size(batch_size))
+        try:
+            for doc in tqdm(cursor, total=total):
+                if field in doc:
+                    mark.update(field=field, value=doc[field], last_id=doc["_id"])
+                yield to_es_action(doc, index_name)
+        finally:
+            cursor.close()
+
+    dead_letter = DeadLetter(dead_letter_path)
+    start = time.perf_counter()
+    try:
+        count = run_bulk(es, actions(), dead_letter, threads, batch_size,
+                         max_chunk_bytes, max_retries, initial_backoff)
+    finally:
+        dead_letter.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Synchronisation terminée : {count} actions ({count / max(elapsed, 1e-9):,.0f} docs/s)")
+    if dead_letter.count:
+        print(f"⚠ {dead_letter.count} documents rejetés → {dead_letter_path}")
+    if mark:
+        state.save(**mark)
+    if count:
+        bump_generation(db, f"index_to_es:{index_name}", mongo_changed=False)
+
+
+def reconcile_index(mongo_uri, db_name, coll_name, es_host, index_name, batch_size=1000,
+                    threads=1, max_chunk_bytes=10 * 1024 * 1024, max_retries=5,
+                    initial_backoff=2, dead_letter_path=DEAD_LETTER):
+    """Réconciliation complète : supprime de l'index les documents absents de Mongo."""
+    db = connect_mongo(mongo_uri, db_name)
+    coll = db[coll_name]
+    es = connect_es(es_host)
+
+    print(f"Réconciliation {index_name} ← {db_name}.{coll_name} (parcours de tous les _id ES)")
+    dead_letter = DeadLetter(dead_letter_path)
+    try:
+        count = run_bulk(es, reconcile_deletes(es, coll, index_name, batch_size), dead_letter,
+                         threads, batch_size, max_chunk_bytes, max_retries, initial_backoff)
+    finally:
+        dead_letter.close()
+
+    print(f"Réconciliation terminée : {count} documents supprimés de l'index")
+    if dead_letter.count:
+        print(f"⚠ {dead_letter.count} suppressions rejetées → {dead_letter_path}")
+    if count:
+        bump_generation(db, f"index_to_es:{index_name}", mongo_changed=False)
+
+
+def tail_changes(mongo_uri, db_name, coll_name, es_host, index_name,
+                 flush_size=500, flush_every_s=1.0, dead_letter_path=DEAD_LETTER):
+    """Suivi continu via change stream ; le resume token est sauvegardé après chaque flush."""
+    db = connect_mongo(mongo_uri, db_name)
+    coll = db[coll_name]
+    es = connect_es(es_host)
+    create_es_index(es, index_name)
+
+    state = SyncState(db, coll_name, index_name)
+    token = state.load().get("resume_token")
+    dead_letter = DeadLetter(dead_letter_path)
+    pending = []
+    last_token = token
+    last_flush = time.monotonic()
+    print(f"Suivi des changements {db_name}.{coll_name} → {index_name} (Ctrl+C pour arrêter)")
+
+    def flush():
+        nonlocal last_flush
+        if pending:
+            n = run_bulk(es, pending, dead_letter, chunk_size=flush_size)
+            print(f"{n} changements appliqués")
+            pending.clear()
+            if n:
+                bump_generation(db, f"index_to_es:{index_name}", mongo_changed=False)
+        if last_token is not None:
+            state.save(resume_token=last_token)
+        last_flush = time.monotonic()
+
+    try:
+        with coll.watch(full_document="updateLookup", resume_after=token) as stream:
+            while stream.alive:
+                change = stream.try_next()
+                if change is not None:
+                    last_token = stream.resume_token
+                    op = change["operationType"]
+                    if op == "delete":
+                        pending.append({"_op_type": "delete", "_index": index_name,
+                                        "_id": str(change["documentKey"]["_id"])})
+                    elif op in ("insert", "update", "replace") and change.get("fullDocument"):
+                        pending.append(to_es_action(change["fullDocument"], index_name))
+                    elif op in ("drop", "invalidate"):
+                        print(f"Collection {op} : arrêt du suivi")
+                        break
+                if len(pending) >= flush_size or time.monotonic() - last_flush >= flush_every_s:
+                    flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        flush()
+        dead_letter.close()
 
-    print(f"Total indexing done: {count}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -147,6 +556,65 @@ if __name__ == "__main__":
     parser.add_argument("--coll", default="crime")
     parser.add_argument("--es", default="http://localhost:9200")
     parser.add_argument("--index", default=ES_INDEX)
+    parser.add_argument("--batch", type=int, default=500, help="docs max par requête bulk")
+    parser.add_argument("--max-chunk-mb", type=float, default=10, help="taille max d'une requête bulk (Mo)")
+    parser.add_argument("--threads", type=int, default=1, help="requêtes bulk concurrentes")
+    parser.add_argument("--max-retries", type=int, default=5, help="tentatives sur 429 (backoff exponentiel)")
+    parser.add_argument("--bulk-load", action="store_true",
+                        help="couper refresh/réplicas pendant l'import, restaurer puis force-merge")
+    parser.add_argument("--no-force-merge", action="store_true")
+    parser.add_argument("--dead-letter", default=DEAD_LETTER, help="JSONL des documents rejetés")
+    parser.add_argument("--incremental", action="store_true",
+                        help="n'indexer que les documents nouveaux/modifiés depuis la dernière synchro")
+    parser.add_argument("--hwm-field", choices=HWM_FIELDS, default="updated_at",
+                        help="champ du high-water mark (_id pour des ObjectId)")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="réconciliation complète : parcourir tout l'index et supprimer "
+                             "les documents absents de Mongo (coûteux, à lancer ponctuellement)")
+    parser.add_argument("--tail", action="store_true",
+                        help="suivi continu via change stream (replica set requis)")
+    parser.add_argument("--input", default=None,
+                        help="indexer directement un fichier propre (jsonl, parquet, arrow) au lieu de Mongo")
+    parser.add_argument("--format", choices=FORMATS, default=None,
+                        help="format de --input (défaut : déduit de l'extension)")
     args = parser.parse_args()
 
-    mongo_to_es(args.mongo, args.db, args.coll, args.es, args.index)
+    if args.input:
+        file_to_es(args.input, args.es, args.index,
+                   fmt=args.format,
+                   batch_size=args.batch,
+                   threads=args.threads,
+                   max_chunk_bytes=int(args.max_chunk_mb * 1024 * 1024),
+                   max_retries=args.max_retries,
+                   bulk_load=args.bulk_load,
+                   force_merge=not args.no_force_merge,
+                   dead_letter_path=args.dead_letter,
+                   mongo_uri=args.mongo,
+                   db_name=args.db)
+    elif args.tail:
+        tail_changes(args.mongo, args.db, args.coll, args.es, args.index,
+                     flush_size=args.batch, dead_letter_path=args.dead_letter)
+    elif args.reconcile:
+        reconcile_index(args.mongo, args.db, args.coll, args.es, args.index,
+                        batch_size=args.batch,
+                        threads=args.threads,
+                        max_chunk_bytes=int(args.max_chunk_mb * 1024 * 1024),
+                        max_retries=args.max_retries,
+                        dead_letter_path=args.dead_letter)
+    elif args.incremental:
+        sync_incremental(args.mongo, args.db, args.coll, args.es, args.index,
+                         field=args.hwm_field,
+                         batch_size=args.batch,
+                         threads=args.threads,
+                         max_chunk_bytes=int(args.max_chunk_mb * 1024 * 1024),
+                         max_retries=args.max_retries,
+                         dead_letter_path=args.dead_letter)
+    else:
+        mongo_to_es(args.mongo, args.db, args.coll, args.es, args.index,
+                    batch_size=args.batch,
+                    threads=args.threads,
+                    max_chunk_bytes=int(args.max_chunk_mb * 1024 * 1024),
+                    max_retries=args.max_retries,
+                    bulk_load=args.bulk_load,
+                    force_merge=not args.no_force_merge,
+                    dead_letter_path=args.dead_letter)
@@ -0,0 +1,194 @@
+# ingest.py
+"""
+Ingestion en un seul passage : le fichier propre (JSONL / Parquet / Arrow)
+est lu et décodé une seule fois, puis chaque batch part en parallèle vers
+- MongoDB : upserts par N threads (writer_worker de load_to_mongo.py),
+- Elasticsearch : requêtes bulk (run_bulk de index_to_es.py).
+Les deux destinations reçoivent le même _id (transform.prepare_doc) : relancer
+l'ingestion remplace les documents au lieu de les dupliquer.
+Les files sont bornées : le lecteur avance au rythme de la destination la
+plus lente.
+"""
+# python ingest.py --input cleaned_crimes.jsonl
+# python ingest.py --input cleaned_crimes.parquet --mongo-workers 4 --es-threads 4 --bulk-load
+# python ingest.py --input cleaned_crimes.jsonl --defer-indexes
+
+
+import time
+import queue
+import argparse
+import threading
+
+from load_to_mongo import (DEFAULT_BATCH_SIZE, DEFAULT_WORKERS, FORMATS, Progress,
+                           bump_generation, connect_mongo, create_indexes, decode_batch,
+                           detect_format, drop_plan_indexes, read_batches, writer_worker,
+                           _STOP as MONGO_STOP)
+from index_to_es import (DEAD_LETTER, ES_INDEX, DeadLetter, begin_bulk_load, connect_es,
+                         create_es_index, end_bulk_load, run_bulk,
+                         _drain, _STOP as ES_STOP)
+from transform import prepare_doc, to_es_action
+from build_rollups import refresh_rollups
+
+
+def es_sink(es, index_name, batches, dead_letter, result, errors, threads,
+            chunk_size, max_chunk_bytes, max_retries):
+    """Consomme la file de batches et l'envoie à ES ; s'arrête sur ES_STOP."""
+    start = time.perf_counter()
+    try:
+        actions = (to_es_action(doc, index_name) for docs in _drain(batches) for doc in docs)
+        result["indexed"] = run_bulk(es, actions, dead_letter, threads, chunk_size,
+                                     max_chunk_bytes, max_retries)
+    except Exception as e:
+        errors.append(e)
+        for _ in _drain(batches):
+            pass  # vider la file pour ne pas bloquer le lecteur
+    result["elapsed"] = time.perf_counter() - start
+
+
+def ingest(path, fmt=None, mongo_uri="mongodb://localhost:27017", db_name="city_safety",
+           coll_name="crimes", es_host="http://localhost:9200", index_name=ES_INDEX,
+           batch_size=DEFAULT_BATCH_SIZE, mongo_workers=DEFAULT_WORKERS, es_threads=2,
+           max_chunk_bytes=10 * 1024 * 1024, max_retries=5, bulk_load=False,
+           force_merge=True, defer_indexes=False, dead_letter_path=DEAD_LETTER,
+           rollups=False):
+
+    fmt = fmt or detect_format(path)
+    db = connect_mongo(mongo_uri, db_name)
+    coll = db[coll_name]
+    es = connect_es(es_host)
+    create_es_index(es, index_name)
+
+    print(f"📥 Ingestion ({fmt}) : {path} → {db_name}.{coll_name} + {index_name}")
+    if defer_indexes:
+        drop_plan_indexes(coll)   # reconstruits après l'import, requêtes lentes d'ici là
+    elif create_indexes(coll):
+        raise SystemExit("❌ Création des index impossible, ingestion annulée.")
+
+    progress = Progress(0)
+    mongo_tasks = queue.Queue(maxsize=2 * mongo_workers)
+    es_batches = queue.Queue(maxsize=2 * es_threads)
+    worker_stats = {}
+    mongo_errors = []
+    es_result = {"indexed": 0, "elapsed": 0.0}
+    es_errors = []
+
+    previous = begin_bulk_load(es, index_name) if bulk_load else None
+    dead_letter = DeadLetter(dead_letter_path)
+    mongo_threads = [
+        threading.Thread(target=writer_worker, daemon=True,
+                         args=(i, coll, mongo_tasks, progress, worker_stats, mongo_errors))
+        for i in range(mongo_workers)
+    ]
+    es_thread = threading.Thread(target=es_sink, daemon=True,
+                                 args=(es, index_name, es_batches, dead_letter, es_result,
+                                       es_errors, es_threads, batch_size, max_chunk_bytes,
+                                       max_retries))
+    started = time.perf_counter()
+    for t in mongo_threads + [es_thread]:
+        t.start()
+
+    read_time = 0.0
+    read_all = False
+    try:
+        batches = read_batches(path, fmt, batch_size)
+        for seq, (end, raw) in enumerate(batches):
+            if mongo_errors or es_errors:
+                break
+            t0 = time.perf_counter()
+            # décodage + geo + _id une seule fois, documents partagés par les deux sorties
+            docs = [prepare_doc(doc) for doc in decode_batch(raw, fmt, progress)]
+            read_time += time.perf_counter() - t0
+            mongo_tasks.put((seq, end, docs))
+            es_batches.put(docs)
+        else:
+            read_all = True
+    finally:
+        for _ in mongo_threads:
+            mongo_tasks.put(MONGO_STOP)
+        es_batches.put(ES_STOP)
+        for t in mongo_threads + [es_thread]:
+            t.join()
+        dead_letter.close()
+        if bulk_load:
+            failed = not read_all or bool(mongo_errors or es_errors)
+            end_bulk_load(es, index_name, previous, force_merge, failed=failed)
+
+    elapsed = time.perf_counter() - started
+    written = progress.get("written")
+    changed = progress.get("changed")
+    indexed = es_result["indexed"]
+    print(f"  décodage     : {read_time:.1f} s")
+    for wid in sorted(worker_stats):
+        docs, busy = worker_stats[wid]
+        print(f"  mongo {wid}      : {docs} docs, {docs / max(busy, 1e-9):,.0f} docs/s")
+    print(f"  elasticsearch : {indexed} docs, "
+          f"{indexed / max(es_result['elapsed'], 1e-9):,.0f} docs/s")
+    status = "❌ Ingestion interrompue" if mongo_errors or es_errors else "✔ Ingestion terminée"
+    print(f"{status} en {elapsed:.1f} s. Mongo : {written}, ES : {indexed}. "
+          f"Lignes invalides : {progress.get('skipped')}, erreurs Mongo : {progress.get('errors')}")
+    if dead_letter.count:
+        print(f"⚠ {dead_letter.count} documents rejetés par ES → {dead_letter_path}")
+    if mongo_errors or es_errors:
+        if written or indexed:
+            bump_generation(db, f"ingest:{coll_name}+{index_name}", mongo_changed=bool(changed))
+        err = (mongo_errors or es_errors)[0]
+        raise SystemExit(f"❌ Ingestion interrompue ({err!r}). Relancer : les upserts sont idempotents.")
+
+    # index différés : collection nue pendant l'import, index construits en une passe à la fin
+    index_failures = create_indexes(coll) if defer_indexes else []
+    if written or indexed:
+        bump_generation(db, f"ingest:{coll_name}+{index_name}", mongo_changed=bool(changed))
+    if rollups:
+        refresh_rollups(db, coll_name)   # après la génération : rollups notés à jour
+    if index_failures:
+        raise SystemExit("❌ Certains index n'ont pas pu être créés.")
+
+
+# -------------------------------------------------
+# CLI
+# -------------------------------------------------
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Fichier propre → MongoDB + Elasticsearch en un seul passage")
+    p.add_argument("--input", required=True, help="fichier propre (jsonl, parquet ou arrow)")
+    p.add_argument("--format", choices=FORMATS, default=None,
+                   help="défaut : déduit de l'extension")
+    p.add_argument("--mongo", default="mongodb://localhost:27017")
+    p.add_argument("--db", default="city_safety")
+    p.add_argument("--coll", default="crimes")
+    p.add_argument("--es", default="http://localhost:9200")
+    p.add_argument("--index", default=ES_INDEX)
+    p.add_argument("--batch", type=int, default=DEFAULT_BATCH_SIZE)
+    p.add_argument("--mongo-workers", type=int, default=DEFAULT_WORKERS,
+                   help="threads d'écriture Mongo")
+    p.add_argument("--es-threads", type=int, default=2, help="requêtes bulk ES concurrentes")
+    p.add_argument("--max-chunk-mb", type=float, default=10, help="taille max d'une requête bulk (Mo)")
+    p.add_argument("--max-retries", type=int, default=5, help="tentatives sur 429 (backoff exponentiel)")
+    p.add_argument("--bulk-load", action="store_true",
+                   help="couper refresh/réplicas ES pendant l'import, restaurer puis force-merge")
+    p.add_argument("--no-force-merge", action="store_true")
+    p.add_argument("--defer-indexes", action="store_true",
+                   help="supprimer les index Mongo du plan et les reconstruire après l'import")
+    p.add_argument("--dead-letter", default=DEAD_LETTER, help="JSONL des documents rejetés par ES")
+    p.add_argument("--rollups", action="store_true",
+                   help="rafraîchir les rollups Mongo des jours importés")
+    args = p.parse_args()
+
+    ingest(
+        path=args.input,
+        fmt=args.format,
+        mongo_uri=args.mongo,
+        db_name=args.db,
+        coll_name=args.coll,
+        es_host=args.es,
+        index_name=args.index,
+        batch_size=args.batch,
+        mongo_workers=args.mongo_workers,
+        es_threads=args.es_threads,
+        max_chunk_bytes=int(args.max_chunk_mb * 1024 * 1024),
+        max_retries=args.max_retries,
+        bulk_load=args.bulk_load,
+        force_merge=not args.no_force_merge,
+        defer_indexes=args.defer_indexes,
+        dead_letter_path=args.dead_letter,
+        rollups=args.rollups,
+    )
@@ -1,23 +1,44 @@
 # load_to_mongo.py
 """
-Importer un JSONL dans MongoDB SANS AUCUNE opération de nettoyage.
+Importer un JSONL (ou Parquet / Arrow) dans MongoDB SANS AUCUNE opération de nettoyage.
 Toutes les transformations doivent déjà être faites dans clean_crimes.py.
 Le script :
-- lit les lignes JSONL,
-- crée un champ geo si latitude/longitude existent,
-- crée seulement les indexes utiles,
-- insère dans MongoDB par batch.
+- lit les lignes JSONL, ou les record batches d'un fichier Parquet / Arrow
+  (pas de parsing texte),
+- crée un champ geo si latitude/longitude existent (transform.py),
+- crée seulement les indexes utiles (plan déclaratif, éventuellement après
+  l'import avec --defer-indexes),
+- écrit dans MongoDB par batch avec N threads (upserts non ordonnés sur un
+  _id dérivé de l'id du crime : relancer l'import ne crée pas de doublons ;
+  un document inchangé, d'après son content_hash, garde son updated_at),
+- enregistre la position validée dans un checkpoint pour --resume,
+- incrémente la génération du jeu de données (dataset_meta) à la fin.
 """
 # python load_to_mongo.py --jsonl cleaned_crimes.jsonl --mongo "mongodb://localhost:27017" --db city_safety --coll crimes
+# python load_to_mongo.py --input cleaned_crimes.parquet --db city_safety --coll crimes
+# python load_to_mongo.py --jsonl cleaned_crimes.jsonl --workers 8 --resume
+# python load_to_mongo.py --jsonl cleaned_crimes.jsonl --defer-indexes
 
 
+import os
 import json
+import time
+import queue
+import hashlib
 import argparse
-from pymongo import MongoClient, ASCENDING, TEXT
-from pymongo.errors import BulkWriteError
+import threading
+from datetime import datetime, timezone
+from pymongo import MongoClient, ASCENDING, TEXT, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
 from tqdm import tqdm
 
+from transform import prepare_doc
+from build_rollups import refresh_rollups
+
 DEFAULT_BATCH_SIZE = 1000
+DEFAULT_WORKERS = 4
+CHECKPOINT_EVERY_S = 1.0
+FORMATS = ("jsonl", "parquet", "arrow")
 
 
 # -------------------------------------------------
@@ -30,138 +51,488 @@ def connect_mongo(uri: str, db_name: str):
 
 # -------------------------------------------------
 # Indexes utiles pour visualisation / analytics
+# Plan déclaratif calqué sur les requêtes réelles : les index composés
+# couvrent aussi leur préfixe (primary_type seul, district seul, risk_level seul).
 # -------------------------------------------------
-def create_indexes(coll):
-    print("🔧 Création des indexes...")
-
-    try:
-        coll.create_index([("case_number", ASCENDING)], background=True)
-    except: pass
-
-    try:
-        coll.create_index([("primary_type", ASCENDING)], background=True)
-    except: pass
-
-    try:
-        coll.create_index([("date", ASCENDING)], background=True)
-    except: pass
-
-    try:
-        coll.create_index([("description", TEXT)], default_language="english")
-    except: pass
-
+INDEX_PLAN = [
+    # Explorer / analytics : type de crime sur une période
+    {"name": "primary_type_date", "keys": [("primary_type", ASCENDING), ("date", ASCENDING)]},
+    # historique d'un district
+    {"name": "district_date", "keys": [("district", ASCENDING), ("date", ASCENDING)]},
+    # tableaux de bord risque : niveau puis gravité
+    {"name": "risk_level_severity", "keys": [("risk_level", ASCENDING), ("severity", ASCENDING)]},
+    # filtres de dates seuls
+    {"name": "date", "keys": [("date", ASCENDING)]},
+    {"name": "case_number", "keys": [("case_number", ASCENDING)]},
+    # synchro incrémentale vers ES (index_to_es.py --incremental)
+    {"name": "updated_at_id", "keys": [("updated_at", ASCENDING), ("_id", ASCENDING)]},
+    {"name": "description_text", "keys": [("description", TEXT)],
+     "options": {"default_language": "english"}},
+    {"name": "geo_2dsphere", "keys": [("geo", "2dsphere")]},
+]
+
+# index des anciennes versions du chargeur remplacés par le plan
+# (préfixes des index composés, severity seul jamais interrogé) : supprimés
+RETIRED_INDEXES = [
+    [("primary_type", ASCENDING)],
+    [("risk_level", ASCENDING)],
+    [("severity", ASCENDING)],
+]
+
+
+def index_key(keys, weights=None):
+    """
+    Clé comparable d'un index, qu'elle vienne du plan ou de index_information() :
+    un index texte y apparaît sous _fts / _ftsx, ses champs sont dans `weights`.
+    """
+    keys = list(keys)
+    if weights is not None or any(d == TEXT for _, d in keys):
+        fields = weights or {f: 1 for f, d in keys if d == TEXT}
+        return ("$text", tuple(sorted(fields)))
+    return tuple((f, int(d) if isinstance(d, (int, float)) else d) for f, d in keys)
+
+
+def existing_indexes(coll):
+    """Clé -> nom des index secondaires présents (l'index _id est exclu)."""
+    return {index_key(info["key"], info.get("weights")): name
+            for name, info in coll.index_information().items() if name != "_id_"}
+
+
+def index_sizes(coll):
+    """Taille de chaque index en octets (storageStats, ou collStats sur les vieux serveurs)."""
     try:
-        coll.create_index([("geo", "2dsphere")], background=True)
-    except: pass
+        stats = next(coll.aggregate([{"$collStats": {"storageStats": {}}}]))["storageStats"]
+    except OperationFailure:
+        stats = coll.database.command("collStats", coll.name)
+    return stats.get("indexSizes", {})
+
+
+def create_indexes(coll, plan=INDEX_PLAN, retired=RETIRED_INDEXES):
+    """
+    Réconcilie les index de la collection avec le plan, par clé et non par nom :
+    un index de même clé déjà présent (ex. date_1 créé par une ancienne version)
+    est gardé sous son nom, les autres sont construits un par un (durée et
+    taille affichées), puis les index remplacés (`retired`) sont supprimés.
+    Retourne la liste des échecs (nom, erreur) au lieu de les ignorer.
+    """
+    print("🔧 Création des indexes...")
+    existing = existing_indexes(coll)
+    timings = {}
+    failures = []
+    for spec in plan:
+        current = existing.get(index_key(spec["keys"]))
+        if current is not None:
+            if current != spec["name"]:
+                print(f"  {spec['name']:<22} déjà présent sous le nom {current}")
+            continue
+        start = time.perf_counter()
+        try:
+            coll.create_index(spec["keys"], name=spec["name"], **spec.get("options", {}))
+        except OperationFailure as e:
+            failures.append((spec["name"], e))
+            print(f"❌ Index {spec['name']} : {e.details.get('errmsg', e) if e.details else e}")
+            continue
+        timings[spec["name"]] = time.perf_counter() - start
+
+    sizes = index_sizes(coll) if timings else {}
+    for name, elapsed in timings.items():
+        size = sizes.get(name)
+        size_txt = f"{size / 1024 / 1024:.1f} Mo" if size is not None else "taille inconnue"
+        print(f"  {name:<22} {elapsed:7.2f} s  {size_txt}")
+
+    # remplacés supprimés seulement une fois le plan en place : les requêtes gardent un index
+    if not failures:
+        for keys in retired:
+            name = existing.get(index_key(keys))
+            if name is not None:
+                coll.drop_index(name)
+                print(f"  {name:<22} supprimé (couvert par le plan)")
+
+    if failures:
+        print(f"⚠ {len(failures)} index en échec.")
+    else:
+        print("✔ Indexes OK.")
+    return failures
+
+
+def drop_plan_indexes(coll, plan=INDEX_PLAN, retired=RETIRED_INDEXES):
+    """
+    Supprime les index du plan et les index remplacés avant un import
+    --defer-indexes : la collection est vraiment nue pendant l'écriture et
+    create_indexes les reconstruit en une passe. Les autres index (ajoutés
+    à la main) sont laissés en place.
+    """
+    keys = {index_key(spec["keys"]) for spec in plan} | {index_key(k) for k in retired}
+    dropped = [name for key, name in existing_indexes(coll).items() if key in keys]
+    for name in dropped:
+        coll.drop_index(name)
+    if dropped:
+        print(f"🔧 Index supprimés pendant l'import : {', '.join(dropped)}")
+    return dropped
 
-    try:
-        coll.create_index([("risk_level", ASCENDING)], background=True)
-        coll.create_index([("severity", ASCENDING)], background=True)
-    except: pass
 
-    print("✔ Indexes OK.")
+# -------------------------------------------------
+# Génération du jeu de données : incrémentée à la fin de chaque import ou
+# indexation, l'API invalide ses réponses en cache quand elle change
+# -------------------------------------------------
+GENERATION_COLL = "dataset_meta"
+
+
+def bump_generation(db, source, mongo_changed=True):
+    """
+    Incrémente la génération. `mongo_changed=False` (indexation ES seule) :
+    des rollups à jour le restent, Mongo n'a pas bougé (voir build_rollups.py).
+    """
+    doc = db[GENERATION_COLL].find_one_and_update(
+        {"_id": "generation"},
+        {"$inc": {"value": 1},
+         "$set": {"updated_at": datetime.now(timezone.utc), "source": source}},
+        upsert=True, return_document=ReturnDocument.AFTER)
+    if not mongo_changed:
+        db[GENERATION_COLL].update_one({"_id": "rollups", "generation": doc["value"] - 1},
+                                       {"$set": {"generation": doc["value"]}})
+    print(f"Génération du jeu de données : {doc['value']} ({source})")
+    return doc["value"]
 
 
 # -------------------------------------------------
-# Construire geo si possible (pas un nettoyage)
+# Lecture du fichier par batch
+# Chaque batch est (position de fin, contenu brut) : octets pour le JSONL,
+# lignes pour Parquet / Arrow. Le décodage se fait dans les workers.
 # -------------------------------------------------
-def build_geo_field(doc: dict):
-    lat = doc.get("latitude") or doc.get("Latitude")
-    lon = doc.get("longitude") or doc.get("Longitude")
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext in ("parquet", "pq"):
+        return "parquet"
+    if ext in ("arrow", "feather", "ipc"):
+        return "arrow"
+    return "jsonl"
+
+
+def read_jsonl_batches(path, batch_size, start=0):
+    size = os.path.getsize(path)
+    offset = start
+    batch = []
+    with open(path, "rb") as f, tqdm(total=size, initial=start, unit="B",
+                                    unit_scale=True, desc="Lecture JSONL") as bar:
+        f.seek(start)
+        for line in f:
+            offset += len(line)
+            bar.update(len(line))
+            batch.append(line)
+            if len(batch) >= batch_size:
+                yield offset, batch
+                batch = []
+    if batch:
+        yield offset, batch
+
+
+def read_columnar_batches(path, fmt, batch_size, start=0):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if fmt == "parquet":
+        pf = pq.ParquetFile(path)
+        batches = pf.iter_batches(batch_size=batch_size)
+        total = pf.metadata.num_rows
+    else:
+        reader = pa.ipc.open_file(pa.memory_map(path))
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        total = None
+
+    row = 0
+    with tqdm(total=total, initial=start, desc=f"Lecture {fmt}") as bar:
+        for rb in batches:
+            # reprise : sauter les lignes déjà validées
+            if row + rb.num_rows <= start:
+                row += rb.num_rows
+                continue
+            first = max(0, start - row)
+            for begin in range(first, rb.num_rows, batch_size):
+                part = rb.slice(begin, batch_size)
+                bar.update(part.num_rows)
+                yield row + begin + part.num_rows, part.to_pylist()
+            row += rb.num_rows
+
+
+def read_batches(path, fmt, batch_size, start=0):
+    if fmt == "jsonl":
+        return read_jsonl_batches(path, batch_size, start)
+    return read_columnar_batches(path, fmt, batch_size, start)
+
+
+def decode_batch(raw, fmt, stats):
+    if fmt != "jsonl":
+        docs = raw
+        # dates au même format texte que le JSONL
+        for doc in docs:
+            if isinstance(doc.get("date"), datetime):
+                doc["date"] = doc["date"].isoformat()
+        return docs
+
+    docs = []
+    for line in raw:
+        if not line.strip():
+            continue
+        try:
+            docs.append(json.loads(line))
+        except:
+            stats.add("skipped", 1)
+    return docs
 
-    try:
-        if lat not in (None, "", 0) and lon not in (None, "", 0):
-            lat = float(lat)
-            lon = float(lon)
 
-            if -90 <= lat <= 90 and -180 <= lon <= 180:
-                return {"type": "Point", "coordinates": [lon, lat]}
-    except:
-        pass
+# -------------------------------------------------
+# Checkpoint : position validée (octets en JSONL, lignes en Parquet / Arrow)
+# -------------------------------------------------
+def checkpoint_path_for(path, db_name, coll_name):
+    return f"{path}.{db_name}.{coll_name}.checkpoint.json"
+
+
+def load_checkpoint(ckpt_path, path, fmt):
+    if not os.path.exists(ckpt_path):
+        return 0
+    with open(ckpt_path, "r", encoding="utf-8") as f:
+        ckpt = json.load(f)
+    if ckpt.get("path") != os.path.abspath(path) or ckpt.get("format") != fmt:
+        raise SystemExit(f"Checkpoint {ckpt_path} ne correspond pas à {path} ({fmt})")
+    if ckpt.get("size") != os.path.getsize(path):
+        raise SystemExit(f"{path} a changé depuis le checkpoint {ckpt_path}")
+    return int(ckpt.get("offset", 0))
+
+
+def save_checkpoint(ckpt_path, path, fmt, offset, done=False):
+    tmp = ckpt_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "path": os.path.abspath(path),
+            "format": fmt,
+            "size": os.path.getsize(path),
+            "offset": offset,
+            "done": done,
+            "saved_at": datetime.now().isoformat(timespec="seconds"),
+        }, f)
+    os.replace(tmp, ckpt_path)
+
+
+class Progress:
+    """
+    Suivi thread-safe des batches validés. La position du checkpoint n'avance
+    que sur les batches contigus : un batch terminé avant un batch plus ancien
+    attend que celui-ci soit validé.
+    """
+
+    def __init__(self, start):
+        self.lock = threading.Lock()
+        self.committed = start
+        self.done = {}          # seq -> position de fin
+        self.next_seq = 0
+        self.counters = {}
+
+    def add(self, key, n):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def get(self, key):
+        return self.counters.get(key, 0)
+
+    def mark_done(self, seq, end):
+        with self.lock:
+            self.done[seq] = end
+            while self.next_seq in self.done:
+                self.committed = self.done.pop(self.next_seq)
+                self.next_seq += 1
+            return self.committed
 
-    # Si un champ "location" existe déjà (dict ou GeoJSON), on le laisse tel quel
-    if isinstance(doc.get("location"), dict):
-        loc = doc["location"]
-        if "lat" in loc and "lon" in loc:
-            try:
-                return {"type": "Point", "coordinates": [float(loc["lon"]), float(loc["lat"])]}
-            except:
-                pass
 
-    return None
+# -------------------------------------------------
+# Workers : décodage + upserts non ordonnés
+# -------------------------------------------------
+_STOP = object()
+
+
+def content_hash(doc):
+    """Empreinte du contenu d'un document préparé (hors _id et champs de suivi)."""
+    body = {k: v for k, v in doc.items() if k not in ("_id", "updated_at", "content_hash")}
+    raw = json.dumps(body, sort_keys=True, ensure_ascii=False, default=str).encode()
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def upsert_op(doc, now):
+    """
+    Upsert qui ne remplace le document que si son contenu a changé : un
+    document identique garde son updated_at (high-water mark de la synchro
+    incrémentale ES et des rollups), une réimportation complète ne
+    renvoie donc que les documents réellement modifiés.
+    """
+    doc["content_hash"] = content_hash(doc)
+    doc["updated_at"] = now
+    replace = {"$cond": [{"$eq": ["$content_hash", doc["content_hash"]]},
+                         "$$ROOT", {"$literal": doc}]}
+    return UpdateOne({"_id": doc["_id"]}, [{"$replaceWith": replace}], upsert=True)
+
+
+def writer_worker(wid, coll, tasks, progress, worker_stats, errors, decode=None):
+    """
+    Upserts des batches de la file. Avec `decode`, le batch brut est décodé et
+    préparé ici ; sans, il contient déjà des documents préparés (ingest.py).
+    """
+    docs_done = 0
+    busy = 0.0
+    while True:
+        item = tasks.get()
+        if item is _STOP:
+            break
+        seq, end, raw = item
+        if errors:
+            continue  # un autre worker a échoué : on vide la file sans écrire
+        start = time.perf_counter()
+        try:
+            docs = [prepare_doc(doc) for doc in decode(raw)] if decode else raw
+            # horodatage d'écriture : high-water mark de la synchro incrémentale ES
+            now = datetime.now(timezone.utc)
+            ops = [upsert_op(doc, now) for doc in docs]
+            if ops:
+                try:
+                    res = coll.bulk_write(ops, ordered=False)
+                    progress.add("written", len(ops))
+                    progress.add("changed", res.modified_count + res.upserted_count)
+                except BulkWriteError as e:
+                    n_err = len(e.details.get("writeErrors", []))
+                    progress.add("written", len(ops) - n_err)
+                    progress.add("changed", e.details.get("nModified", 0) + e.details.get("nUpserted", 0))
+                    progress.add("errors", n_err)
+                    print(f"⚠ Worker {wid} : {n_err} erreurs ignorées dans le batch {seq}.")
+            docs_done += len(ops)
+            progress.mark_done(seq, end)
+        except Exception as e:
+            errors.append(e)
+        busy += time.perf_counter() - start
+    worker_stats[wid] = (docs_done, busy)
 
 
 # -------------------------------------------------
-# Insertion JSONL → MongoDB
+# Insertion fichier → MongoDB
 # -------------------------------------------------
 def insert_jsonl(jsonl_path, mongo_uri="mongodb://localhost:27017",
                  db_name="city_safety", coll_name="crimes",
-                 batch_size=DEFAULT_BATCH_SIZE):
+                 batch_size=DEFAULT_BATCH_SIZE, fmt=None,
+                 workers=DEFAULT_WORKERS, resume=False, checkpoint=None,
+                 defer_indexes=False, rollups=False):
 
     db = connect_mongo(mongo_uri, db_name)
     coll = db[coll_name]
-
-    print(f"📥 Importation : {jsonl_path} → {db_name}.{coll_name}")
-    create_indexes(coll)
-
-    batch = []
-    total = 0
-    skipped = 0
-
-    with open(jsonl_path, "r", encoding="utf-8") as f:
-        for line in tqdm(f, desc="Lecture JSONL"):
-            try:
-                doc = json.loads(line)
-            except:
-                skipped += 1
-                continue
-
-            # Ajouter geo si possible (ce n’est PAS du cleaning)
-            geo = build_geo_field(doc)
-            if geo:
-                doc["geo"] = geo
-
-            batch.append(doc)
-
-            if len(batch) >= batch_size:
-                try:
-                    coll.insert_many(batch, ordered=False)
-                    total += len(batch)
-                except BulkWriteError as e:
-                    inserted = len(batch) - len(e.details.get("writeErrors", []))
-                    total += max(0, inserted)
-                    print(f"⚠ Erreurs batch ignorées ({len(e.details.get('writeErrors', []))}).")
-                batch = []
-
-        # Insérer dernier batch
-        if batch:
-            try:
-                coll.insert_many(batch, ordered=False)
-                total += len(batch)
-            except BulkWriteError as e:
-                inserted = len(batch) - len(e.details.get("writeErrors", []))
-                total += max(0, inserted)
-                print(f"⚠ Erreurs batch final ignorées.")
-
-    print(f"✔ Import terminé. Total inséré ≈ {total}. Lignes invalides : {skipped}")
+    fmt = fmt or detect_format(jsonl_path)
+    ckpt_path = checkpoint or checkpoint_path_for(jsonl_path, db_name, coll_name)
+    start_offset = load_checkpoint(ckpt_path, jsonl_path, fmt) if resume else 0
+
+    print(f"📥 Importation ({fmt}, {workers} workers) : {jsonl_path} → {db_name}.{coll_name}")
+    if start_offset:
+        unit = "octets" if fmt == "jsonl" else "lignes"
+        print(f"↪ Reprise à la position {start_offset} ({unit}) depuis {ckpt_path}")
+    if defer_indexes:
+        drop_plan_indexes(coll)   # reconstruits après l'import, requêtes lentes d'ici là
+    elif create_indexes(coll):
+        # index créés avant l'import : chaque écriture les maintient tous
+        raise SystemExit("❌ Création des index impossible, import annulé.")
+
+    progress = Progress(start_offset)
+    tasks = queue.Queue(maxsize=2 * workers)   # file bornée : le lecteur attend les workers
+    worker_stats = {}
+    errors = []
+    threads = [
+        threading.Thread(target=writer_worker,
+                         args=(i, coll, tasks, progress, worker_stats, errors,
+                               lambda raw: decode_batch(raw, fmt, progress)),
+                         daemon=True)
+        for i in range(workers)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+
+    last_save = 0.0
+    read_all = False   # reste faux sur Ctrl+C ou exception : checkpoint non terminé
+    try:
+        for seq, (end, raw) in enumerate(read_batches(jsonl_path, fmt, batch_size, start_offset)):
+            if errors:
+                break
+            tasks.put((seq, end, raw))
+            now = time.perf_counter()
+            if now - last_save >= CHECKPOINT_EVERY_S:
+                save_checkpoint(ckpt_path, jsonl_path, fmt, progress.committed)
+                last_save = now
+        else:
+            read_all = True
+    finally:
+        for _ in threads:
+            tasks.put(_STOP)
+        for t in threads:
+            t.join()
+        save_checkpoint(ckpt_path, jsonl_path, fmt, progress.committed,
+                        done=read_all and not errors)
+
+    elapsed = time.perf_counter() - started
+    for wid in sorted(worker_stats):
+        docs, busy = worker_stats[wid]
+        print(f"  worker {wid} : {docs} docs, {docs / max(busy, 1e-9):,.0f} docs/s")
+    written = progress.get("written")
+    changed = progress.get("changed")
+    status = "❌ Import interrompu" if errors else "✔ Import terminé"
+    print(f"{status}. Total écrit : {written} ({written / max(elapsed, 1e-9):,.0f} docs/s), "
+          f"dont {changed} nouveaux ou modifiés. "
+          f"Lignes invalides : {progress.get('skipped')}, erreurs : {progress.get('errors')}")
+    if errors:
+        if changed:
+            bump_generation(db, f"load_to_mongo:{coll_name}")
+        raise SystemExit(f"❌ Import interrompu ({errors[0]!r}). Relancer avec --resume.")
+
+    # index différés : collection nue pendant l'import, index construits en une passe à la fin
+    index_failures = create_indexes(coll) if defer_indexes else []
+    if changed:
+        bump_generation(db, f"load_to_mongo:{coll_name}")
+    if rollups:
+        refresh_rollups(db, coll_name)   # jours touchés depuis le dernier passage
+    if index_failures:
+        raise SystemExit("❌ Certains index n'ont pas pu être créés.")
 
 
 # -------------------------------------------------
 # CLI
 # -------------------------------------------------
 if __name__ == "__main__":
-    p = argparse.ArgumentParser(description="Importer un JSONL dans MongoDB (sans cleaning)")
-    p.add_argument("--jsonl", required=True, help="Chemin du JSONL propre")
+    p = argparse.ArgumentParser(description="Importer un JSONL / Parquet / Arrow dans MongoDB (sans cleaning)")
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--jsonl", help="Chemin du JSONL propre")
+    src.add_argument("--input", help="Chemin du fichier propre (jsonl, parquet ou arrow)")
+    p.add_argument("--format", choices=FORMATS, default=None,
+                   help="défaut : déduit de l'extension")
     p.add_argument("--mongo", default="mongodb://localhost:27017")
     p.add_argument("--db", default="city_safety")
     p.add_argument("--coll", default="crimes")
     p.add_argument("--batch", type=int, default=DEFAULT_BATCH_SIZE)
+    p.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                   help="threads d'écriture concurrents")
+    p.add_argument("--resume", action="store_true",
+                   help="reprendre à la dernière position validée du checkpoint")
+    p.add_argument("--checkpoint", default=None,
+                   help="défaut : <fichier>.<db>.<coll>.checkpoint.json")
+    p.add_argument("--defer-indexes", action="store_true",
+                   help="supprimer les index du plan, importer dans la collection nue puis "
+                        "les reconstruire (requêtes lentes pendant l'import)")
+    p.add_argument("--rollups", action="store_true",
+                   help="rafraîchir les rollups (build_rollups.py) des jours importés")
     args = p.parse_args()
 
     insert_jsonl(
-        jsonl_path=args.jsonl,
+        jsonl_path=args.jsonl or args.input,
         mongo_uri=args.mongo,
         db_name=args.db,
         coll_name=args.coll,
-        batch_size=args.batch
+        batch_size=args.batch,
+        fmt=args.format,
+        workers=args.workers,
+        resume=args.resume,
+        checkpoint=args.checkpoint,
+        defer_indexes=args.defer_indexes,
+        rollups=args.rollups
     )
@@ -0,0 +1,181 @@
+# transform.py
+"""
+Transformations par document partagées par les chargeurs (aucun nettoyage :
+tout est déjà fait dans clean_crimes.py).
+- derive_id : _id stable, identique dans MongoDB et Elasticsearch
+- build_geo_field : champ geo GeoJSON pour l'index 2dsphere Mongo
+- prepare_doc : geo + _id, appliqué une seule fois par document
+- to_es_source / to_es_action : document Elasticsearch (noms de champs,
+  geo_point lat/lon, floats, entiers, champs d'affichage calculés une fois
+  à l'indexation : l'API renvoie _source tel quel)
+Utilisé par load_to_mongo.py, index_to_es.py et ingest.py.
+"""
+import json
+import hashlib
+
+
+# -------------------------------------------------
+# _id stable : relancer l'import remplace au lieu de dupliquer
+# -------------------------------------------------
+def derive_id(doc: dict):
+    if doc.get("id") not in (None, ""):
+        return str(doc["id"])
+    # pas d'id crime : hash du contenu (stable d'un import à l'autre)
+    raw = json.dumps(doc, sort_keys=True, default=str).encode("utf-8")
+    return "sha1:" + hashlib.sha1(raw).hexdigest()
+
+
+# -------------------------------------------------
+# Construire geo si possible (pas un nettoyage)
+# -------------------------------------------------
+def build_geo_field(doc: dict):
+    lat = doc.get("latitude") or doc.get("Latitude")
+    lon = doc.get("longitude") or doc.get("Longitude")
+
+    try:
+        if lat not in (None, "", 0) and lon not in (None, "", 0):
+            lat = float(lat)
+            lon = float(lon)
+
+            if -90 <= lat <= 90 and -180 <= lon <= 180:
+                return {"type": "Point", "coordinates": [lon, lat]}
+    except:
+        pass
+
+    # Si un champ "location" existe déjà (dict ou GeoJSON), on le laisse tel quel
+    if isinstance(doc.get("location"), dict):
+        loc = doc["location"]
+        if "lat" in loc and "lon" in loc:
+            try:
+                return {"type": "Point", "coordinates": [float(loc["lon"]), float(loc["lat"])]}
+            except:
+                pass
+
+    return None
+
+
+def prepare_doc(doc: dict):
+    """geo puis _id, dans cet ordre (le hash des docs sans id inclut geo)."""
+    # Ajouter geo si possible (ce n’est PAS du cleaning)
+    geo = build_geo_field(doc)
+    if geo:
+        doc["geo"] = geo
+    doc["_id"] = derive_id(doc)
+    return doc
+
+
+# -------------------------------------------------
+# Document Elasticsearch
+# -------------------------------------------------
+# champ ES -> clé du document propre (Mongo ou fichier)
+ES_FIELDS = {
+    "id": "id",
+    "case_number": "case_number",
+    "date": "date",
+    "block": "block",
+    "IUCR": "IUCR",
+    "primary_type": "primary_type",
+    "description": "description",
+    "location_description": "location_description",
+    "Arrest": "Arrest",
+    "Domestic": "Domestic",
+    "district": "district",
+    "community_area": "community_area",
+    "fbi_code": "FBI Code",
+    "x_coord": "x_coord",
+    "y_coord": "y_coord",
+    "year": "year",
+    "Updated_On": "Updated On",
+    "Date_parsed": "Date_parsed",
+    "hour": "hour",
+    "period_of_day": "period_of_day",
+    "severity": "severity",
+    "victims_count": "victims_count",
+    "victim_type_breakdown": "victim_type_breakdown",
+    "severity_norm_row": "severity_norm_row",
+    "risk_raw": "risk_raw",
+    "risk_location_score": "risk_location_score",
+    "risk_level": "risk_level",
+}
+# champs proposés par la saisie semi-automatique (champ completion "suggest")
+SUGGEST_FIELDS = ("primary_type", "description", "location_description", "block")
+# valeurs manquantes ramenées à 0.0
+FLOAT_FIELDS = ("severity_norm_row", "risk_raw")
+# champs entiers dans le mapping (filtres term et tris numériques sans conversion)
+INT_FIELDS = ("district", "hour")
+
+SEVERITY_LABEL = {
+    5: "Very High",
+    4: "High",
+    3: "Medium",
+    2: "Low",
+    1: "Very Low"
+}
+VICTIM_TYPES = ("physical", "psychological", "property")
+
+
+def to_int(v):
+    """Entier ou None (vide, NaN, texte non numérique)."""
+    try:
+        return int(float(v))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def severity_label(v):
+    n = to_int(v)
+    if n is None:
+        return None
+    return SEVERITY_LABEL.get(n, str(v))
+
+
+def victim_type_selected(vt):
+    """Premier type de victime non nul, dans l'ordre physique / psychologique / biens."""
+    if not isinstance(vt, dict):
+        return None
+    for k in VICTIM_TYPES:
+        if (to_int(vt.get(k)) or 0) > 0:
+            return k
+    return None
+
+
+def es_geo_point(doc):
+    """geo_point {lat, lon} depuis le GeoJSON Mongo ou le champ location du fichier."""
+    geo = doc.get("geo")
+    if isinstance(geo, dict) and geo.get("coordinates"):
+        lon, lat = geo["coordinates"]
+        return {"lat": lat, "lon": lon}
+
+    loc = doc.get("location")
+    if isinstance(loc, dict):
+        lat = loc.get("lat")
+        lon = loc.get("lon")
+        if lat is not None and lon is not None:
+            return {"lat": float(lat), "lon": float(lon)}
+    return None
+
+
+def to_es_source(doc):
+    source = {field: doc.get(key) for field, key in ES_FIELDS.items()}
+    for field in FLOAT_FIELDS:
+        source[field] = float(source[field] or 0)
+    for field in INT_FIELDS:
+        source[field] = to_int(source[field])
+    source["severity_label"] = severity_label(source["severity"])
+    source["victim_type_selected"] = victim_type_selected(source["victim_type_breakdown"])
+    inputs = [v.strip() for v in (source[f] for f in SUGGEST_FIELDS) if isinstance(v, str) and v.strip()]
+    if inputs:
+        source["suggest"] = {"input": list(dict.fromkeys(inputs))}
+    geo = es_geo_point(doc)
+    if geo is not None:
+        source["geo"] = geo
+    return source
+
+
+def to_es_action(doc, index_name):
+    # même _id que Mongo : les documents lus depuis le fichier passent par prepare_doc
+    return {
+        "_index": index_name,
+        "_id": str(doc.get("_id")),
+        "_source": to_es_source(doc),
+    }
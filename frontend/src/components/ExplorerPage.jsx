@@ -21,12 +21,16 @@ export default function ExplorerPage() {
   const [total, setTotal] = useState(0);
   const [allTypes, setAllTypes] = useState([]);
   const [allDistricts, setAllDistricts] = useState([]);
+  const [suggestions, setSuggestions] = useState([]);
 
   const api = "http://localhost:8000";
+  // champs affichés par CrimeCard : le reste du document n'est pas transféré
+  const cardFields = "primary_type,description,date,location_description,block,district,victim_type_selected,Arrest";
 
   // Main search function
   const search = async () => {
-  const params = {};
+  // facettes des listes déroulantes, comptées dans la même requête
+  const params = { fields: cardFields, facets: "primary_type,district" };
   if (q) params.q = q;
   if (primaryType) params.primary_type = primaryType.toLowerCase();
   if (district) params.district = Number(district);
@@ -40,6 +44,8 @@ export default function ExplorerPage() {
     console.log("Search response:", res.data); // debug
     setResults(res.data.hits);
     setTotal(res.data.total);
+    setAllTypes(res.data.facets?.primary_type || []);
+    setAllDistricts(res.data.facets?.district || []);
   } catch (err) {
     console.error("Search error:", err);
     setResults([]);
@@ -47,30 +53,31 @@ export default function ExplorerPage() {
   }
 };
 
-  // Fetch unique values for dropdown filters
-  const fetchFilters = async () => {
-    try {
-      const res = await axios.get(`${api}/api/aggregations/summary`);
-      const types = res.data.by_type?.buckets?.map((b) => b.key) || [];
-      const districts = res.data.by_hour?.buckets?.map((b) => b.key) || [];
-      setAllTypes(types);
-      setAllDistricts(districts);
-    } catch (err) {
-      console.error("Error fetching filters:", err);
-    }
-  };
-
- // Keep this to populate dropdowns
-useEffect(() => {
-  fetchFilters();
-}, []);
-
-// Ajoutez ceci après votre useEffect actuel qui fait fetchFilters et search()
 useEffect(() => {
-  // Lance la recherche à chaque changement de filtre ou de recherche
+  // Lance la recherche à chaque changement de filtre ; le texte libre est
+  // lancé par Entrée ou le bouton Search (la frappe n'appelle que /api/suggest)
   search();
   // eslint-disable-next-line react-hooks/exhaustive-deps
-}, [q, primaryType, district, dateFrom, dateTo]);
+}, [primaryType, district, dateFrom, dateTo]);
+
+// Suggestions pendant la frappe, après une courte pause
+useEffect(() => {
+  const prefix = q.trim();
+  if (!prefix) {
+    setSuggestions([]);
+    return;
+  }
+  const timer = setTimeout(async () => {
+    try {
+      const res = await axios.get(`${api}/api/suggest`, { params: { prefix } });
+      setSuggestions(res.data.suggestions || []);
+    } catch (err) {
+      console.error("Suggest error:", err);
+      setSuggestions([]);
+    }
+  }, 150);
+  return () => clearTimeout(timer);
+}, [q]);
 
 
   return (
@@ -91,8 +98,15 @@ useEffect(() => {
               placeholder="Search for a crime (e.g., theft...)"
               value={q}
               onChange={(e) => setQ(e.target.value)}
+              onKeyDown={(e) => e.key === "Enter" && search()}
+              list="q-suggestions"
               className="input"
             />
+            <datalist id="q-suggestions">
+              {suggestions.map((s) => (
+                <option key={s} value={s} />
+              ))}
+            </datalist>
           </div>
 
           <button onClick={search} className="search-btn">
@@ -109,8 +123,8 @@ useEffect(() => {
             className="input"
           >
             <option value="">All types</option>
-            {allTypes.map((type) => (
-              <option key={type} value={type}>{type}</option>
+            {allTypes.map(({ key, count }) => (
+              <option key={key} value={key}>{key} ({count})</option>
             ))}
           </select>
 
@@ -121,8 +135,8 @@ useEffect(() => {
             className="input"
           >
             <option value="">All districts</option>
-            {allDistricts.map((d) => (
-              <option key={d} value={d}>{d}</option>
+            {allDistricts.map(({ key, count }) => (
+              <option key={key} value={key}>{key} ({count})</option>
             ))}
           </select>
 